@@ -0,0 +1,159 @@
+import math
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from config import Config
+
+# Admission control in front of the vote commit path. Votes are rate limited
+# per election and queued for a fixed set of shards, so a burst when polls open
+# is rejected early with 429 instead of piling up on MySQL. Each election is
+# routed to one shard by hashing its ID. A shard has its own bounded queue and
+# a single worker thread that commits its votes in batches, so appends to an
+# election's chain are serialized without a global lock, and a busy election
+# only delays the elections that share its shard.
+
+def shard_for(election_id, shards):
+    return zlib.crc32(election_id.encode()) % shards
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_take(self):
+        # Returns 0 if a token was taken, otherwise seconds until one is available
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+class Shard:
+    def __init__(self, index, queue_size):
+        self.index = index
+        self.queue = queue.Queue(maxsize=queue_size)
+        # Per-election state kept by commit_batch; only the shard's worker writes to it
+        self.state = {}
+
+class AdmissionController:
+    def __init__(self, commit_batch, queue_size=None, shards=None, batch_size=None, rate=None, burst=None):
+        # commit_batch takes a list of items and the shard's state dict and
+        # returns one outcome per item (a result or an Exception instance)
+        self.commit_batch = commit_batch
+        shard_count = shards or Config.ADMISSION_SHARDS
+        shard_queue_size = max((queue_size or Config.ADMISSION_QUEUE_SIZE) // shard_count, 1)
+        self.shards = [Shard(i, shard_queue_size) for i in range(shard_count)]
+        self.batch_size = batch_size or Config.ADMISSION_BATCH_SIZE
+        self.rate = rate or Config.ADMISSION_RATE_PER_ELECTION
+        self.burst = burst or Config.ADMISSION_BURST
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.started = False
+        self.stats = {
+            'accepted': 0,
+            'rejected_queue_full': 0,
+            'rejected_rate_limited': 0,
+            'committed': 0,
+            'failed': 0,
+            'batches': 0,
+            'total_wait': 0.0,
+            'max_wait': 0.0
+        }
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.started:
+                return
+            for shard in self.shards:
+                threading.Thread(target=self._worker, args=(shard,), name=f'vote-shard-{shard.index}', daemon=True).start()
+            self.started = True
+
+    def _bucket(self, election_id):
+        with self.lock:
+            bucket = self.buckets.get(election_id)
+            if bucket is None:
+                bucket = self.buckets[election_id] = TokenBucket(self.rate, self.burst)
+            return bucket
+
+    def shard(self, election_id):
+        return self.shards[shard_for(election_id, len(self.shards))]
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def submit(self, election_id, item):
+        self._ensure_started()
+        wait = self._bucket(election_id).try_take()
+        if wait:
+            self._count('rejected_rate_limited')
+            raise AdmissionRejected("Too many votes for this election, please retry", math.ceil(wait))
+        future = Future()
+        try:
+            self.shard(election_id).queue.put_nowait((time.monotonic(), item, future))
+        except queue.Full:
+            self._count('rejected_queue_full')
+            raise AdmissionRejected("Vote queue is full, please retry", Config.ADMISSION_RETRY_AFTER)
+        self._count('accepted')
+        return future
+
+    def _worker(self, shard):
+        while True:
+            batch = [shard.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(shard.queue.get_nowait())
+                except queue.Empty:
+                    break
+            started = time.monotonic()
+            waits = [started - enqueued for enqueued, _, _ in batch]
+            with self.lock:
+                self.stats['batches'] += 1
+                self.stats['total_wait'] += sum(waits)
+                self.stats['max_wait'] = max(self.stats['max_wait'], max(waits))
+            try:
+                outcomes = self.commit_batch([item for _, item, _ in batch], shard.state)
+            except Exception as e:
+                outcomes = [e] * len(batch)
+            for (_, _, future), outcome in zip(batch, outcomes):
+                if isinstance(outcome, Exception):
+                    self._count('failed')
+                    future.set_exception(outcome)
+                else:
+                    self._count('committed')
+                    future.set_result(outcome)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        processed = stats['committed'] + stats['failed']
+        shard_depths = [shard.queue.qsize() for shard in self.shards]
+        return {
+            'queue_depth': sum(shard_depths),
+            'queue_capacity': sum(shard.queue.maxsize for shard in self.shards),
+            'shards': len(self.shards),
+            'shard_queue_depths': shard_depths,
+            'shard_elections': [len(shard.state) for shard in self.shards],
+            'accepted': stats['accepted'],
+            'rejected_queue_full': stats['rejected_queue_full'],
+            'rejected_rate_limited': stats['rejected_rate_limited'],
+            'committed': stats['committed'],
+            'failed': stats['failed'],
+            'batches': stats['batches'],
+            'avg_wait_ms': (stats['total_wait'] / processed * 1000) if processed else 0.0,
+            'max_wait_ms': stats['max_wait'] * 1000
+        }
@@ -1,169 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, current_app, request, jsonify, send_file
 from flask_cors import CORS
 import time
 import hashlib
 import json
+import os
 from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeout
+from config import Config
 from db import get_db_connection
-from otp_utils import generate_and_store_otp, verify_otp
-
-app = Flask(__name__)
-CORS(app)
+from blockchain.block import Block
+from blockchain.consensus import check_authority_config, verify_seal
+from blockchain.vote import VOTE_FIELDS
+from otp_utils import generate_and_store_otp, queue_otp, verify_otp
+from voter_cache import get_voter, invalidate_voter, public_voter
+from sealed_results import CACHE_CONTROL, store_sealed, get_sealed, discard_sealed
+from vote_ledger import commit_vote_batch, ElectionClosed
+from chain_tips import get_tip, wait_for_new_tip
+from admission import AdmissionController, AdmissionRejected
+from turnout import GRANULARITIES, get_turnout
+from election_cache import get_election_meta, get_voting_status, invalidate_election, add_approved_voter
+from init_db import ensure_schema
+from warmup import Warmup
+
+api = Blueprint('api', __name__)
 
 # Global storage
 elections = None
 registered_voters = None
 admin_key = "admin123"
-
-class Block:
-    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0):
-        self.index = index
-        self.transactions = transactions
-        self.timestamp = timestamp
-        self.previous_hash = previous_hash
-        self.nonce = nonce
-        self.hash = self.calculate_hash()
-
-    def calculate_hash(self):
-        block_string = json.dumps({
-            "index": self.index,
-            "transactions": [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.transactions],
-            "timestamp": self.timestamp,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
-
-    def mine_block(self, difficulty):
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-        return self.hash
-
-    def to_dict(self):
-        return {
-            "index": self.index,
-            "transactions": [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.transactions],
-            "timestamp": self.timestamp,
-            "previous_hash": self.previous_hash,
-            "hash": self.hash,
-            "nonce": self.nonce
-        }
-
-class Vote:
-    def __init__(self, voter_id, candidate, election_id, timestamp):
-        self.voter_id = voter_id
-        self.candidate = candidate
-        self.election_id = election_id
-        self.timestamp = timestamp
-        self.hash = self.calculate_hash()
-
-    def calculate_hash(self):
-        vote_string = json.dumps({
-            "voter_id": self.voter_id,
-            "candidate": self.candidate,
-            "election_id": self.election_id,
-            "timestamp": self.timestamp
-        }, sort_keys=True)
-        return hashlib.sha256(vote_string.encode()).hexdigest()
-
-    def to_dict(self):
-        return {
-            "voter_id": self.voter_id,
-            "candidate": self.candidate,
-            "election_id": self.election_id,
-            "timestamp": self.timestamp,
-            "hash": self.hash
-        }
-
-class Blockchain:
-    def __init__(self, election_id):
-        self.election_id = election_id
-        self.chain = [self.create_genesis_block()]
-        self.difficulty = 2
-        self.pending_transactions = []
-
-    def create_genesis_block(self):
-        return Block(0, [], time.time(), "0")
-
-    def get_latest_block(self):
-        return self.chain[-1]
-
-    def mine_pending_transactions(self):
-        if self.pending_transactions:
-            block = Block(len(self.chain), self.pending_transactions, time.time(), self.get_latest_block().hash)
-            block.mine_block(self.difficulty)
-            self.chain.append(block)
-            self.pending_transactions = []
-            return True
-        return False
-
-    def add_vote(self, vote):
-        # Check if voter has already voted in this election
-        for block in self.chain:
-            for transaction in block.transactions:
-                if hasattr(transaction, 'voter_id') and transaction.voter_id == vote.voter_id:
-                    return False
-        self.pending_transactions.append(vote)
-        return True
-
-    def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-
-            if current_block.hash != current_block.calculate_hash():
-                return False
-
-            if current_block.previous_hash != previous_block.hash:
-                return False
-        return True
-
-    def get_all_votes(self):
-        votes = []
-        for block in self.chain:
-            for transaction in block.transactions:
-                if hasattr(transaction, 'to_dict'):
-                    votes.append(transaction.to_dict())
-                else:
-                    votes.append(transaction)
-        return votes
-
-    def get_votes_by_candidate(self):
-        votes = self.get_all_votes()
-        result = {}
-        for vote in votes:
-            if isinstance(vote, dict) and 'candidate' in vote:
-                candidate = vote['candidate']
-                if candidate in result:
-                    result[candidate] += 1
-                else:
-                    result[candidate] = 1
-        return result
-
-class Election:
-    def __init__(self, election_id, name, candidates, start_time, end_time, status="upcoming"):
-        self.election_id = election_id
-        self.name = name
-        self.candidates = candidates
-        self.start_time = start_time
-        self.end_time = end_time
-        self.status = status
-        self.blockchain = Blockchain(election_id)
-        self.approved_voters = set()
-
-# Helper functions
-def get_election_status(election):
-    now = time.time()
-    if election.status == "suspended":
-        return "suspended"
-    elif now < election.start_time:
-        return "upcoming"
-    elif now > election.end_time:
-        return "completed"
-    else:
-        return "active"
+vote_admission = AdmissionController(commit_vote_batch)
 
 # Helper functions for DB access
 
@@ -185,26 +50,121 @@ def get_voters_from_db():
     conn.close()
     return rows
 
-def save_block_to_db(election_id, block):
+# Fields of a vote as they appear in a block's hashed transactions (Vote.to_dict)
+CHAIN_TX_FIELDS = VOTE_FIELDS
+# Columns of the votes table, as returned in /chain transactions
+VOTE_COLUMNS = ('id',) + CHAIN_TX_FIELDS
+
+def load_chain_from_db(cursor, election_id, since=-1, limit=None):
+    # Blocks after block_index `since` (at most `limit` of them) with their transactions, in one query
+    block_filter = 'b.election_id=%s AND b.block_index > %s'
+    params = (election_id, since)
+    if limit is not None:
+        block_filter = '''b.id IN (SELECT id FROM (SELECT id FROM blocks WHERE election_id=%s AND block_index > %s
+            ORDER BY block_index, id LIMIT %s) AS batch)'''
+        params = (election_id, since, limit)
+    cursor.execute(f'''SELECT b.id AS block_id, b.block_index, b.timestamp AS block_timestamp, b.previous_hash,
+            b.hash AS block_hash, b.nonce, b.seal, v.*
+        FROM blocks b
+        LEFT JOIN block_transactions bt ON bt.block_id = b.id
+        LEFT JOIN votes v ON v.id = bt.vote_id
+        WHERE {block_filter}
+        ORDER BY b.block_index, b.id, v.id''', params)
+    chain_data = []
+    block_id = None
+    for row in cursor.fetchall():
+        if row['block_id'] != block_id:
+            block_id = row['block_id']
+            chain_data.append({
+                "index": row['block_index'],
+                "transactions": [],
+                "timestamp": row['block_timestamp'],
+                "previous_hash": row['previous_hash'],
+                "hash": row['block_hash'],
+                "nonce": row['nonce'],
+                "seal": row['seal']
+            })
+        if row['id'] is not None:
+            chain_data[-1]['transactions'].append({field: row[field] for field in VOTE_COLUMNS})
+    return chain_data
+
+def verify_chain_data(chain_data):
+    # Same checks as blockchain.Blockchain.is_chain_valid, run on blocks loaded from the DB
+    for i, block in enumerate(chain_data):
+        transactions = [{field: tx[field] for field in CHAIN_TX_FIELDS} for tx in block['transactions']]
+        rebuilt = Block(block['index'], transactions, block['timestamp'], block['previous_hash'], block['nonce'], block.get('seal', ''))
+        if rebuilt.hash != block['hash'] or not verify_seal(rebuilt):
+            return False
+        if i > 0 and block['previous_hash'] != chain_data[i-1]['hash']:
+            return False
+    return True
+
+def compute_results(cursor, election_id):
+    cursor.execute('SELECT candidate, COUNT(*) as votes FROM votes WHERE election_id=%s GROUP BY candidate', (election_id,))
+    results = {row['candidate']: row['votes'] for row in cursor.fetchall()}
+    # Count unique voters who voted in this election
+    cursor.execute('SELECT COUNT(DISTINCT voter_id) as turnout FROM votes WHERE election_id=%s', (election_id,))
+    turnout = cursor.fetchone()['turnout']
+    return results, turnout
+
+def live_results(election_id):
+    # Tally kept by the election's admission shard, used while it is in step with the chain
+    state = vote_admission.shard(election_id).state.get(election_id)
+    if state is None:
+        return None
+    tip_index, results, turnout = state.snapshot
+    tip = get_tip(election_id)
+    if tip_index != (tip[0] if tip else -1):
+        return None
+    return results, turnout
+
+def finalize_election(election_id):
+    # Compute the final tally, chain root and verification stamp once and seal them
     conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce) VALUES (%s, %s, %s, %s, %s, %s)''',
-        (election_id, block.index, block.timestamp, block.previous_hash, block.hash, block.nonce))
-    block_id = cursor.lastrowid
-    # Save transactions for this block
-    for tx in block.transactions:
-        # Find vote id by hash
-        cursor.execute('SELECT id FROM votes WHERE hash=%s', (tx.hash,))
-        vote_row = cursor.fetchone()
-        if vote_row:
-            vote_id = vote_row[0]
-            cursor.execute('INSERT INTO block_transactions (block_id, vote_id) VALUES (%s, %s)', (block_id, vote_id))
-    conn.commit()
+    cursor = conn.cursor(dictionary=True)
+    results, turnout = compute_results(cursor, election_id)
+    chain_data = load_chain_from_db(cursor, election_id)
     cursor.close()
     conn.close()
+    chain_root = chain_data[-1]['hash'] if chain_data else "0"
+    verification_stamp = hashlib.sha256(json.dumps({
+        "election_id": election_id,
+        "results": results,
+        "voter_turnout_count": turnout,
+        "chain_root": chain_root,
+        "length": len(chain_data)
+    }, sort_keys=True).encode()).hexdigest()
+    return store_sealed(election_id, {
+        "election_id": election_id,
+        "results": results,
+        "voter_turnout_count": turnout,
+        "chain": chain_data,
+        "chain_root": chain_root,
+        "chain_valid": verify_chain_data(chain_data),
+        "verification_stamp": verification_stamp,
+        "sealed_at": time.time()
+    })
+
+def finalize_if_completed(cursor, election_id):
+    # A completed election without a sealed artifact (e.g. the artifact was
+    # lost or sealing failed when it was stopped) gets sealed on first read
+    cursor.execute('SELECT status FROM elections WHERE election_id=%s', (election_id,))
+    election = cursor.fetchone()
+    if election and election['status'] == "completed":
+        return finalize_election(election_id)
+    return None
+
+def sealed_response(sealed, view):
+    if request.if_none_match and sealed['stamp'] in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(sealed[view], status=200, mimetype='application/json')
+    response.set_etag(sealed['stamp'])
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
 
 # Routes
-@app.route('/elections', methods=['GET'])
+@api.route('/elections', methods=['GET'])
 def get_elections():
     try:
         elections_list = []
@@ -229,7 +189,7 @@ def get_elections():
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/create_election', methods=['POST'])
+@api.route('/create_election', methods=['POST'])
 def create_election():
     try:
         data = request.get_json()
@@ -259,7 +219,7 @@ def create_election():
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/manage_election', methods=['POST'])
+@api.route('/manage_election', methods=['POST'])
 def manage_election():
     try:
         data = request.get_json()
@@ -300,11 +260,23 @@ def manage_election():
         conn.commit()
         cursor.close()
         conn.close()
+        invalidate_election(election_id)
+        # The UPDATE above waited for the vote commits holding the election row's
+        # shared lock, and every commit after it sees the new status and is
+        # rejected, so nothing can land after the tally below is sealed
+        if new_status == "completed":
+            try:
+                finalize_election(election_id)
+            except Exception as e:
+                # Results are still served live and get sealed on the next request
+                print(f"Failed to seal results for {election_id}: {e}")
+        else:
+            discard_sealed(election_id)
         return jsonify({"message": f"Election {action}ed successfully"}), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/approve_voter', methods=['POST'])
+@api.route('/approve_voter', methods=['POST'])
 def approve_voter():
     try:
         data = request.get_json()
@@ -338,6 +310,8 @@ def approve_voter():
         conn.commit()
         cursor.close()
         conn.close()
+        add_approved_voter(election_id, voter_hash)
+        invalidate_voter(voter_hash)
         return jsonify({
             "message": f"Voter approved for {election_id} successfully",
             "voter_hash": voter_hash,
@@ -346,7 +320,7 @@ def approve_voter():
         }), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
-@app.route('/vote', methods=['POST'])
+@api.route('/vote', methods=['POST'])
 def add_vote():
     try:
         data = request.get_json()
@@ -355,131 +329,254 @@ def add_vote():
             return jsonify({"message": "Missing fields"}), 400
         voter_id_hash = hashlib.sha256(data['voter_id'].encode()).hexdigest()
         election_id = data['election_id']
-        # Check if election exists in DB
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM elections WHERE election_id=%s', (election_id,))
-        election = cursor.fetchone()
+        # Pre-validate against the cached election metadata
+        election = get_election_meta(election_id)
         if not election:
-            cursor.close()
-            conn.close()
             return jsonify({"message": "Election not found"}), 404
-        # Check election status
-        now = time.time()
-        if election['status'] == "suspended":
-            status = "suspended"
-        elif now < election['start_time']:
-            status = "upcoming"
-        elif now > election['end_time']:
-            status = "completed"
-        else:
-            status = "active"
+        status = get_voting_status(election)
         if status != "active":
-            cursor.close()
-            conn.close()
             return jsonify({"message": f"Election is {status}. Cannot vote."}), 400
-        # Check voter approval
-        cursor.execute('SELECT * FROM voters WHERE hashed_id=%s AND status=%s', (voter_id_hash, 'Active'))
-        voter = cursor.fetchone()
-        if not voter:
-            cursor.close()
-            conn.close()
+        if voter_id_hash not in election['approved_voters']:
             return jsonify({"message": "Voter not approved for this election"}), 400
-        # Check candidate validity
-        candidates = json.loads(election['candidates']) if election['candidates'] else []
-        if data['candidate'] not in candidates:
-            cursor.close()
-            conn.close()
+        if data['candidate'] not in election['candidates']:
             return jsonify({"message": "Invalid candidate"}), 400
-        # Check if voter already voted in this election
-        cursor.execute('SELECT * FROM votes WHERE voter_id=%s AND election_id=%s', (voter_id_hash, election_id))
-        if cursor.fetchone():
+        # Queue the vote for the commit workers, which check for a previous
+        # vote and insert the vote and its block in a single transaction
+        try:
+            future = vote_admission.submit(election_id, (election_id, voter_id_hash, data['candidate']))
+        except AdmissionRejected as e:
+            response = jsonify({"message": e.reason})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+        try:
+            committed = future.result(timeout=Config.ADMISSION_WAIT_TIMEOUT)
+        except FutureTimeout:
+            return jsonify({"message": "Vote queued and will be recorded shortly"}), 202
+        except ElectionClosed as e:
+            return jsonify({"message": str(e)}), 400
+        if not committed:
+            return jsonify({"message": "Voter has already voted in this election"}), 400
+        return jsonify({"message": "Vote added successfully"}), 201
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/results/<election_id>', methods=['GET'])
+def get_results(election_id):
+    try:
+        sealed = get_sealed(election_id)
+        if sealed:
+            return sealed_response(sealed, 'results')
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        sealed = finalize_if_completed(cursor, election_id)
+        if sealed:
             cursor.close()
             conn.close()
-            return jsonify({"message": "Voter has already voted in this election"}), 400
-        # Create and add vote
-        vote_hash = hashlib.sha256(json.dumps({
-            "voter_id": voter_id_hash,
-            "candidate": data['candidate'],
-            "election_id": election_id,
-            "timestamp": time.time()
-        }, sort_keys=True).encode()).hexdigest()
-        cursor.execute('''INSERT INTO votes (voter_id, candidate, election_id, timestamp, hash) VALUES (%s, %s, %s, %s, %s)''',
-            (voter_id_hash, data['candidate'], election_id, time.time(), vote_hash))
-        conn.commit()
+            return sealed_response(sealed, 'results')
+        live = live_results(election_id)
+        results, turnout = live if live else compute_results(cursor, election_id)
         cursor.close()
         conn.close()
-        # --- Mine block and save to DB ---
-        # Recreate blockchain for this election from DB
+        return jsonify({"results": results, "voter_turnout_count": turnout}), 200
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/turnout/<election_id>', methods=['GET'])
+def get_election_turnout(election_id):
+    # Turnout time series from the rollups, ?granularity=minute|hour&start=<ts>&end=<ts>&candidate=<name>
+    try:
+        granularity = request.args.get('granularity', default='minute')
+        if granularity not in GRANULARITIES:
+            return jsonify({"message": "granularity must be minute or hour"}), 400
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', type=float)
+        candidate = request.args.get('candidate')
+        buckets = get_turnout(election_id, granularity, start, end, candidate)
+        return jsonify({
+            "election_id": election_id,
+            "granularity": granularity,
+            "bucket_seconds": GRANULARITIES[granularity],
+            "buckets": buckets,
+            "total": sum(bucket['votes'] for bucket in buckets)
+        }), 200
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/chain/<election_id>', methods=['GET'])
+def get_chain(election_id):
+    # ?since=<block_index> or ?since_hash=<hash> returns only the blocks after
+    # that one (304 if there are none), and ?wait=<seconds> holds the request
+    # until a new block arrives
+    try:
+        since = request.args.get('since', type=int)
+        since_hash = request.args.get('since_hash')
+        wait = min(request.args.get('wait', default=0, type=float), Config.CHAIN_LONG_POLL_MAX)
+        delta = since is not None or since_hash is not None
+        sealed = get_sealed(election_id)
+        if sealed and not delta:
+            return sealed_response(sealed, 'chain')
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM blocks WHERE election_id=%s ORDER BY block_index', (election_id,))
-        blocks = cursor.fetchall()
-        chain = []
-        for block in blocks:
-            cursor.execute('''SELECT v.* FROM block_transactions bt JOIN votes v ON bt.vote_id = v.id WHERE bt.block_id=%s''', (block['id'],))
-            transactions = [type('Vote', (), tx)() for tx in cursor.fetchall()]
-            chain.append(Block(block['block_index'], transactions, block['timestamp'], block['previous_hash'], block['nonce']))
-        # Add the new vote as a pending transaction and mine
-        new_vote = Vote(voter_id_hash, data['candidate'], election_id, time.time())
-        blockchain = Blockchain(election_id)
-        blockchain.chain = chain if chain else [blockchain.create_genesis_block()]
-        blockchain.pending_transactions = [new_vote]
-        if blockchain.mine_pending_transactions():
-            save_block_to_db(election_id, blockchain.chain[-1])
+        if not sealed:
+            sealed = finalize_if_completed(cursor, election_id)
+        if sealed and not delta:
+            cursor.close()
+            conn.close()
+            return sealed_response(sealed, 'chain')
+        if not delta:
+            chain_data = load_chain_from_db(cursor, election_id)
+            cursor.close()
+            conn.close()
+            return jsonify({
+                "chain": chain_data,
+                "length": len(chain_data),
+                "election_id": election_id
+            }), 200
+        reset = False
+        if since_hash is not None:
+            cursor.execute('SELECT block_index FROM blocks WHERE election_id=%s AND hash=%s', (election_id, since_hash))
+            row = cursor.fetchone()
+            if row:
+                since = row['block_index']
+            else:
+                # Unknown hash (e.g. the chain was rebuilt): send the whole chain
+                since = -1
+                reset = True
         cursor.close()
         conn.close()
-        return jsonify({"message": "Vote added successfully"}), 201
+        if sealed:
+            if since >= sealed['tip_index'] and not reset:
+                return current_app.response_class(status=304)
+            chain_data = [block for block in json.loads(sealed['chain'])['chain'] if block['index'] > since]
+        else:
+            tip = get_tip(election_id)
+            # A tip behind `since` (a cached tip from another process, or a shorter
+            # chain) counts as no new blocks too
+            if (tip[0] if tip else -1) <= since and wait > 0:
+                # Long poll; no DB connection is held while waiting
+                tip = wait_for_new_tip(election_id, since, wait)
+            if (tip[0] if tip else -1) <= since and not reset:
+                return current_app.response_class(status=304)
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            chain_data = load_chain_from_db(cursor, election_id, since)
+            cursor.close()
+            conn.close()
+        return jsonify({
+            "chain": chain_data,
+            "length": len(chain_data),
+            "election_id": election_id,
+            "since": since,
+            "reset": reset
+        }), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/results/<election_id>', methods=['GET'])
-def get_results(election_id):
+@api.route('/verify/<election_id>', methods=['GET'])
+def verify_chain(election_id):
     try:
+        sealed = get_sealed(election_id)
+        if sealed:
+            return sealed_response(sealed, 'verification')
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT candidate, COUNT(*) as votes FROM votes WHERE election_id=%s GROUP BY candidate', (election_id,))
-        results = {row['candidate']: row['votes'] for row in cursor.fetchall()}
-        # Count unique voters who voted in this election
-        cursor.execute('SELECT COUNT(DISTINCT voter_id) as turnout FROM votes WHERE election_id=%s', (election_id,))
-        turnout = cursor.fetchone()['turnout']
+        sealed = finalize_if_completed(cursor, election_id)
+        if sealed:
+            cursor.close()
+            conn.close()
+            return sealed_response(sealed, 'verification')
+        chain_data = load_chain_from_db(cursor, election_id)
         cursor.close()
         conn.close()
-        return jsonify({"results": results, "voter_turnout_count": turnout}), 200
+        return jsonify({
+            "election_id": election_id,
+            "valid": verify_chain_data(chain_data),
+            "length": len(chain_data),
+            "chain_root": chain_data[-1]['hash'] if chain_data else "0"
+        }), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/chain/<election_id>', methods=['GET'])
-def get_chain(election_id):
+@api.route('/audit', methods=['POST'])
+def audit_election():
+    try:
+        data = request.get_json()
+        if 'admin_key' not in data or data['admin_key'] != admin_key:
+            return jsonify({"message": "Invalid admin key"}), 401
+        if 'election_id' not in data:
+            return jsonify({"message": "Missing election_id"}), 400
+        # Imported here so numpy is only needed when an audit is run
+        from audit import start_audit_job
+        job = start_audit_job(data['election_id'])
+        return jsonify({"message": "Audit started", "job_id": job['job_id']}), 202
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/audit/<job_id>', methods=['GET'])
+def audit_status(job_id):
+    from audit import get_audit_job
+    job = get_audit_job(job_id)
+    if job is None:
+        return jsonify({"message": "Audit not found"}), 404
+    status = {key: value for key, value in job.items() if key != 'result'}
+    return jsonify({**status, "report": job['result']}), 200
+
+@api.route('/export', methods=['POST'])
+def export_election_route():
+    # Starts a columnar export of an election in the background, see export.py
+    try:
+        data = request.get_json()
+        if 'admin_key' not in data or data['admin_key'] != admin_key:
+            return jsonify({"message": "Invalid admin key"}), 401
+        if 'election_id' not in data:
+            return jsonify({"message": "Missing election_id"}), 400
+        from export import start_export_job
+        job = start_export_job(data['election_id'], data.get('candidate'), data.get('start'), data.get('end'))
+        return jsonify({"message": "Export started", "job_id": job['job_id']}), 202
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/export/<job_id>', methods=['GET'])
+def export_status(job_id):
+    from export import get_export_job
+    job = get_export_job(job_id)
+    if job is None:
+        return jsonify({"message": "Export not found"}), 404
+    files = {table: {"rows": info['rows'], "file": os.path.basename(info['path'])}
+        for table, info in (job['result'] or {}).items()}
+    status = {key: value for key, value in job.items() if key != 'result'}
+    return jsonify({**status, "files": files}), 200
+
+@api.route('/export/<job_id>/<table>', methods=['GET'])
+def export_file(job_id, table):
+    from export import get_export_job
+    job = get_export_job(job_id)
+    if job is None or job['status'] != "done" or table not in job['result']:
+        return jsonify({"message": "Export file not found"}), 404
+    return send_file(os.path.abspath(job['result'][table]['path']), as_attachment=True)
+
+@api.route('/replication/blocks/<election_id>', methods=['GET'])
+def replication_blocks(election_id):
+    # Batches of blocks (headers and transactions) for read replicas, see replication.py
     try:
+        since = request.args.get('since', default=-1, type=int)
+        limit = min(request.args.get('limit', default=Config.REPLICA_BATCH_SIZE, type=int), Config.REPLICA_BATCH_SIZE)
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM blocks WHERE election_id=%s ORDER BY block_index', (election_id,))
-        blocks = cursor.fetchall()
-        chain_data = []
-        for block in blocks:
-            # Get transactions for this block
-            cursor.execute('''SELECT v.* FROM block_transactions bt JOIN votes v ON bt.vote_id = v.id WHERE bt.block_id=%s''', (block['id'],))
-            transactions = [dict(row) for row in cursor.fetchall()]
-            chain_data.append({
-                "index": block['block_index'],
-                "transactions": transactions,
-                "timestamp": block['timestamp'],
-                "previous_hash": block['previous_hash'],
-                "hash": block['hash'],
-                "nonce": block['nonce']
-            })
+        blocks = load_chain_from_db(cursor, election_id, since, limit)
         cursor.close()
         conn.close()
+        tip = get_tip(election_id)
         return jsonify({
-            "chain": chain_data,
-            "length": len(chain_data),
-            "election_id": election_id
+            "election_id": election_id,
+            "blocks": blocks,
+            "tip_index": tip[0] if tip else -1,
+            "tip_hash": tip[1] if tip else None
         }), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/voters', methods=['GET'])
+@api.route('/voters', methods=['GET'])
 def get_voters():
     try:
         voters_list = []
@@ -497,7 +594,17 @@ def get_voters():
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/register_voter', methods=['POST'])
+@api.route('/voter/<hashed_id>', methods=['GET'])
+def get_voter_by_id(hashed_id):
+    try:
+        voter = get_voter(hashed_id)
+        if not voter:
+            return jsonify({"message": "Voter not found"}), 404
+        return jsonify(public_voter(voter)), 200
+    except Exception as e:
+        return jsonify({"message": f"Server error: {str(e)}"}), 500
+
+@api.route('/register_voter', methods=['POST'])
 def register_voter_self():
     try:
         data = request.get_json()
@@ -523,6 +630,7 @@ def register_voter_self():
         conn.commit()
         cursor.close()
         conn.close()
+        invalidate_voter(voter_id_hash)
         return jsonify({
             "message": "Registration submitted successfully. Waiting for admin approval.",
             "hashed_id": voter_id_hash
@@ -530,11 +638,23 @@ def register_voter_self():
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    return jsonify({"status": "healthy", "timestamp": time.time()}), 200
+@api.route('/admission/stats', methods=['GET'])
+def admission_stats():
+    return jsonify(vote_admission.get_stats()), 200
 
-@app.route('/send_otp', methods=['POST'])
+@api.route('/health', methods=['GET'])
+def health_check():
+    # 503 until the startup warm-up is done, so load balancers hold traffic back
+    warmup = current_app.extensions['warmup']
+    ready = warmup.ready.is_set()
+    return jsonify({
+        "status": "healthy" if ready else "warming_up",
+        "ready": ready,
+        "warmup": warmup.status(),
+        "timestamp": time.time()
+    }), 200 if ready else 503
+
+@api.route('/send_otp', methods=['POST'])
 def send_otp():
     data = request.get_json()
     email = data.get('email')
@@ -546,7 +666,22 @@ def send_otp():
     except Exception as e:
         return jsonify({'message': f'Failed to send OTP: {str(e)}'}), 500
 
-@app.route('/verify_otp', methods=['POST'])
+@api.route('/send_login_otp', methods=['POST'])
+def send_login_otp():
+    data = request.get_json()
+    voter_id = data.get('id')
+    if not voter_id:
+        return jsonify({'message': 'Voter ID is required'}), 400
+    try:
+        voter = get_voter(hashlib.sha256(voter_id.encode()).hexdigest())
+        if not voter:
+            return jsonify({'message': 'Voter ID not found. Please register first.'}), 404
+        queue_otp(voter['email'])
+        return jsonify({'message': 'OTP sent to email'}), 200
+    except Exception as e:
+        return jsonify({'message': f'Failed to send OTP: {str(e)}'}), 500
+
+@api.route('/verify_otp', methods=['POST'])
 def verify_otp_route():
     data = request.get_json()
     email = data.get('email')
@@ -558,7 +693,7 @@ def verify_otp_route():
     else:
         return jsonify({'message': 'Invalid or expired OTP'}), 400
 
-@app.route('/login_voter', methods=['POST'])
+@api.route('/login_voter', methods=['POST'])
 def login_voter():
     try:
         data = request.get_json()
@@ -568,41 +703,62 @@ def login_voter():
             return jsonify({"message": f"Missing required fields: {', '.join(missing_fields)}"}), 400
         # Fetch voter by ID
         voter_id_hash = hashlib.sha256(data['id'].encode()).hexdigest()
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM voters WHERE hashed_id=%s', (voter_id_hash,))
-        voter = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        voter = get_voter(voter_id_hash)
         if not voter:
             return jsonify({"message": "Voter not found. Please register first."}), 404
         # Verify OTP
-        from otp_utils import verify_otp
         if not verify_otp(voter['email'], data['otp']):
             return jsonify({"message": "Invalid or expired OTP"}), 400
-        return jsonify({"message": "Login successful", "voter_id": voter_id_hash}), 200
+        return jsonify({"message": "Login successful", "voter_id": voter_id_hash, "voter": public_voter(voter)}), 200
     except Exception as e:
         return jsonify({"message": f"Server error: {str(e)}"}), 500
 
+def create_app(warm=None):
+    # The DDL only runs when the stored schema version is behind. Open
+    # elections are warmed in the background (unless WARM_CACHES is off) and
+    # /health reports ready once that is done.
+    check_authority_config()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(api)
+    if ensure_schema():
+        print("Database initialized.")
+    warmup = Warmup(vote_admission)
+    app.extensions['warmup'] = warmup
+    if Config.WARM_CACHES if warm is None else warm:
+        warmup.start()
+    else:
+        warmup.skip()
+    return app
+
 if __name__ == '__main__':
-    # Automatically initialize the database tables before starting the server
-    from init_db import initialize_db
-    initialize_db()
-    print("Database initialized.")
+    app = create_app()
     print("Starting Flask server on port 5000...")
     print("Available endpoints:")
-    print("  GET  /health - Health check")
+    print("  GET  /health - Health check (503 until the cache warm-up is done)")
     print("  GET  /elections - List all elections")
     print("  POST /create_election - Create new election")
     print("  POST /manage_election - Manage election status")
     print("  POST /approve_voter - Approve voter for election")
     print("  POST /vote - Cast a vote")
+    print("  GET  /admission/stats - Vote queue depth, wait times and rejections")
     print("  GET  /results/<election_id> - Get election results")
-    print("  GET  /chain/<election_id> - Get blockchain data")
+    print("  GET  /turnout/<election_id> - Votes per minute or hour (?granularity=&start=&end=&candidate=)")
+    print("  GET  /chain/<election_id> - Get blockchain data (?since=<index>&wait=<seconds> for new blocks only)")
+    print("  GET  /verify/<election_id> - Verify blockchain integrity")
+    print("  POST /audit - Start a recount of an election, cross-checking votes against the chain")
+    print("  GET  /audit/<job_id> - Audit job status and report")
+    print("  POST /export - Export an election's votes and blocks to columnar files")
+    print("  GET  /export/<job_id> - Export job status")
+    print("  GET  /export/<job_id>/<table> - Download an exported table")
+    print("  GET  /replication/blocks/<election_id> - Block batches for read replicas")
     print("  GET  /voters - Get all registered voters")
+    print("  GET  /voter/<hashed_id> - Look up a single voter")
     print("  POST /register_voter - Register new voter")
     print("  POST /send_otp - Send OTP to email")
+    print("  POST /send_login_otp - Send login OTP for a voter ID")
     print("  POST /verify_otp - Verify OTP")
     print("  POST /login_voter - Login voter with OTP")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # No debug reloader: it would run create_app (and the warm-up) in a second process
+    app.run(host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import aiomysql
+from aiohttp import web
+from pymysql.constants import ER
+from admission import shard_for
+from blockchain.consensus import check_authority_config
+from config import Config
+from db import DB_CONFIG
+from election_cache import get_election_meta, get_voting_status
+from otp_utils import generate_and_store_otp, verify_otp
+from sealed_results import CACHE_CONTROL, get_sealed
+from turnout import UPSERT_ROLLUP_SQL, rollup_row
+from vote_ledger import (LOCK_TIP_SQL, LOCK_ELECTION_SQL, INSERT_VOTE_SQL, INSERT_BLOCK_SQL, INSERT_BLOCK_TX_SQL,
+    ElectionClosed, build_vote_block, block_row)
+
+# Async ingestion front end serving the /vote, /results and /send_otp contracts
+# of app.py. Connections are held by the event loop instead of one blocking
+# thread each. DB access goes through an aiomysql pool, mining runs in a process
+# pool, and blocking calls (SMTP, cache loads, disk reads) run in the default
+# thread executor.
+
+def json_error(message, status):
+    return web.json_response({"message": message}, status=status)
+
+async def run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+async def commit_vote(app, conn, cursor, election_id, voter_id, candidate):
+    # Same single transaction as vote_ledger.commit_vote, with the previous-vote
+    # check made under the tip lock. Returns False if the voter already voted.
+    # The metadata cache may be ELECTION_CACHE_TTL behind a stop or suspend, so
+    # the status is read again with the election row share-locked, as in
+    # vote_ledger.check_election_open.
+    await conn.begin()
+    try:
+        await cursor.execute(LOCK_ELECTION_SQL, (election_id,))
+        row = await cursor.fetchone()
+        if not row:
+            raise ElectionClosed("Election not found")
+        status = get_voting_status(dict(zip(('status', 'start_time', 'end_time'), row)))
+        if status != "active":
+            raise ElectionClosed(f"Election is {status}. Cannot vote.")
+        await cursor.execute(LOCK_TIP_SQL, (election_id,))
+        tip = await cursor.fetchone()
+        await cursor.execute('SELECT id FROM votes WHERE voter_id=%s AND election_id=%s', (voter_id, election_id))
+        if await cursor.fetchone():
+            await conn.rollback()
+            return False
+        vote, block, genesis = await asyncio.get_running_loop().run_in_executor(
+            app['mining_pool'], build_vote_block, election_id, voter_id, candidate, tip)
+        if genesis:
+            await cursor.execute(INSERT_BLOCK_SQL, block_row(election_id, genesis))
+        await cursor.execute(INSERT_VOTE_SQL, (vote.voter_id, vote.candidate, vote.election_id, vote.timestamp, vote.hash))
+        vote_id = cursor.lastrowid
+        await cursor.execute(INSERT_BLOCK_SQL, block_row(election_id, block))
+        await cursor.execute(INSERT_BLOCK_TX_SQL, (cursor.lastrowid, vote_id))
+        await cursor.execute(UPSERT_ROLLUP_SQL, rollup_row(election_id, vote.candidate, vote.timestamp))
+        await conn.commit()
+        return True
+    except Exception:
+        await conn.rollback()
+        raise
+
+async def add_vote(request):
+    try:
+        data = await request.json()
+        required_fields = ['voter_id', 'candidate', 'election_id']
+        if not all(field in data for field in required_fields):
+            return json_error("Missing fields", 400)
+        voter_id_hash = hashlib.sha256(data['voter_id'].encode()).hexdigest()
+        election_id = data['election_id']
+        # Pre-validate against the cached election metadata
+        election = await run_blocking(get_election_meta, election_id)
+        if not election:
+            return json_error("Election not found", 404)
+        status = get_voting_status(election)
+        if status != "active":
+            return json_error(f"Election is {status}. Cannot vote.", 400)
+        if voter_id_hash not in election['approved_voters']:
+            return json_error("Voter not approved for this election", 400)
+        if data['candidate'] not in election['candidates']:
+            return json_error("Invalid candidate", 400)
+        # Votes of one election are committed one at a time, on the same shards as admission.py
+        lock = request.app['election_locks'][shard_for(election_id, len(request.app['election_locks']))]
+        async with lock, request.app['db_pool'].acquire() as conn:
+            async with conn.cursor() as cursor:
+                # A Flask shard commits from its cached tip without the row lock, so it can
+                # take the block index first; like vote_ledger._commit_one, retry once on the new tip
+                for attempt in range(2):
+                    try:
+                        committed = await commit_vote(request.app, conn, cursor, election_id, voter_id_hash, data['candidate'])
+                        break
+                    except aiomysql.IntegrityError as e:
+                        if e.args[0] != ER.DUP_ENTRY or attempt:
+                            raise
+        if not committed:
+            return json_error("Voter has already voted in this election", 400)
+        return web.json_response({"message": "Vote added successfully"}, status=201)
+    except ElectionClosed as e:
+        return json_error(str(e), 400)
+    except Exception as e:
+        return json_error(f"Server error: {str(e)}", 500)
+
+async def get_results(request):
+    election_id = request.match_info['election_id']
+    try:
+        sealed = await run_blocking(get_sealed, election_id)
+        if sealed:
+            if any(etag.value == sealed['stamp'] for etag in request.if_none_match or ()):
+                response = web.Response(status=304)
+            else:
+                response = web.Response(body=sealed['results'], content_type='application/json')
+            response.etag = sealed['stamp']
+            response.headers['Cache-Control'] = CACHE_CONTROL
+            return response
+        async with request.app['db_pool'].acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute('SELECT candidate, COUNT(*) FROM votes WHERE election_id=%s GROUP BY candidate', (election_id,))
+                results = {candidate: votes for candidate, votes in await cursor.fetchall()}
+                # Count unique voters who voted in this election
+                await cursor.execute('SELECT COUNT(DISTINCT voter_id) FROM votes WHERE election_id=%s', (election_id,))
+                turnout = (await cursor.fetchone())[0]
+        return web.json_response({"results": results, "voter_turnout_count": turnout})
+    except Exception as e:
+        return json_error(f"Server error: {str(e)}", 500)
+
+async def send_otp(request):
+    data = await request.json()
+    email = data.get('email')
+    if not email:
+        return json_error('Email is required', 400)
+    try:
+        await run_blocking(generate_and_store_otp, email)
+        return web.json_response({'message': 'OTP sent to email'})
+    except Exception as e:
+        return json_error(f'Failed to send OTP: {str(e)}', 500)
+
+async def verify_otp_route(request):
+    # OTPs live in process memory, so they are verified by the process that sent them
+    data = await request.json()
+    email = data.get('email')
+    otp = data.get('otp')
+    if not email or not otp:
+        return json_error('Email and OTP are required', 400)
+    if verify_otp(email, otp):
+        return web.json_response({'message': 'OTP verified'})
+    else:
+        return json_error('Invalid or expired OTP', 400)
+
+async def open_resources(app):
+    app['db_pool'] = await aiomysql.create_pool(
+        host=DB_CONFIG['host'], user=DB_CONFIG['user'], password=DB_CONFIG['password'],
+        db=DB_CONFIG['database'], minsize=1, maxsize=Config.ASYNC_DB_POOL_SIZE,
+        # Plain reads must not leave a transaction open, or the pool closes the connection on release
+        autocommit=True)
+    app['mining_pool'] = ProcessPoolExecutor(max_workers=Config.MINING_WORKERS)
+    app['election_locks'] = [asyncio.Lock() for _ in range(Config.ADMISSION_SHARDS)]
+
+async def close_resources(app):
+    app['db_pool'].close()
+    await app['db_pool'].wait_closed()
+    app['mining_pool'].shutdown()
+
+def create_async_app():
+    check_authority_config()
+    app = web.Application(middlewares=[cors_middleware])
+    app.router.add_post('/vote', add_vote)
+    app.router.add_get('/results/{election_id}', get_results)
+    app.router.add_post('/send_otp', send_otp)
+    app.router.add_post('/verify_otp', verify_otp_route)
+    app.on_startup.append(open_resources)
+    app.on_cleanup.append(close_resources)
+    return app
+
+if __name__ == '__main__':
+    print(f"Starting async ingestion server on port {Config.ASYNC_PORT}...")
+    web.run_app(create_async_app(), host='0.0.0.0', port=Config.ASYNC_PORT, backlog=4096)
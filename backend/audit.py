@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from blockchain.block import Block
+from blockchain.consensus import check_authority_config, seal_problem
+from config import Config
+from db import stream_rows
+from jobs import JobRunner
+
+# Recount of an election from the raw tables. votes, block_transactions and
+# blocks are streamed in batches. Candidates are mapped to integer codes and
+# tallied with numpy, and vote hashes and block hashes/seals are re-derived in a
+# process pool. The report lists every disagreement between the three tables:
+#   orphan_links          block_transactions rows pointing at a missing vote or a vote of another election
+#   unlinked_votes        votes that are in no block
+#   multiply_linked_votes votes that are in more than one block
+#   duplicate_voters      voters with more than one vote
+#   hash_mismatches       votes whose stored hash doesn't match their contents
+#                         (votes cast before vote_ledger hashed the stored timestamp all show up here)
+#   invalid_blocks        blocks whose hash doesn't match their contents or whose seal is invalid
+#   broken_links          blocks whose previous_hash isn't the hash of the block before
+#
+#   python audit.py <election_id> [--workers N] [--batch-size N]
+
+def _voter_keys(voter_ids):
+    # First 64 bits of each hex voter hash as uint64, exact duplicates are confirmed afterwards
+    return np.frombuffer(bytes.fromhex(''.join(voter_id[:16] for voter_id in voter_ids)), dtype='>u8').astype(np.uint64)
+
+class CandidateCodes:
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def encode(self, candidates):
+        unique, inverse = np.unique(np.array(candidates, dtype=object), return_inverse=True)
+        lookup = np.empty(len(unique), dtype=np.int64)
+        for i, name in enumerate(unique):
+            if name not in self.codes:
+                self.codes[name] = len(self.names)
+                self.names.append(name)
+            lookup[i] = self.codes[name]
+        return lookup[inverse]
+
+    def tally(self, counts):
+        return {name: int(counts[code]) for code, name in enumerate(self.names) if code < len(counts) and counts[code]}
+
+def check_vote_hashes(election_id, ids, voter_ids, candidates, timestamps, hashes):
+    # Runs in a worker process; returns the ids of votes whose hash doesn't match
+    mismatched = []
+    for vote_id, voter_id, candidate, timestamp, vote_hash in zip(ids, voter_ids, candidates, timestamps, hashes):
+        expected = hashlib.sha256(json.dumps({
+            "voter_id": voter_id,
+            "candidate": candidate,
+            "election_id": election_id,
+            "timestamp": timestamp
+        }, sort_keys=True).encode()).hexdigest()
+        if expected != vote_hash:
+            mismatched.append(vote_id)
+    return mismatched
+
+def check_blocks(blocks):
+    # Runs in a worker process; returns (block_index, problem) for blocks that don't verify
+    problems = []
+    for block in blocks:
+        rebuilt = Block(block['index'], block['transactions'], block['timestamp'], block['previous_hash'], block['nonce'], block['seal'])
+        if rebuilt.hash != block['hash']:
+            problems.append((block['index'], "hash does not match contents"))
+            continue
+        problem = seal_problem(rebuilt)
+        if problem:
+            problems.append((block['index'], problem))
+    return problems
+
+class _Jobs:
+    # Results of pool jobs, with at most `limit` batches in flight so memory stays bounded
+    def __init__(self, pool, limit):
+        self.pool = pool
+        self.limit = limit
+        self.in_flight = deque()
+        self.results = []
+
+    def submit(self, func, *args):
+        self.in_flight.append(self.pool.submit(func, *args))
+        while len(self.in_flight) > self.limit:
+            self.results.extend(self.in_flight.popleft().result())
+
+    def collect(self):
+        while self.in_flight:
+            self.results.extend(self.in_flight.popleft().result())
+        return self.results
+
+def _sample(values):
+    values = list(values)
+    return {"count": len(values), "sample": values[:Config.AUDIT_SAMPLE_LIMIT]}
+
+def run_audit(election_id, workers=None, batch_size=None):
+    batch_size = batch_size or Config.AUDIT_BATCH_SIZE
+    workers = workers or os.cpu_count() or 1
+    started = time.time()
+    codes = CandidateCodes()
+    vote_ids, voter_keys, vote_codes = [], [], []
+    # Spawned, not forked: the API server process has commit, OTP and warm-up threads running
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        hash_jobs = _Jobs(pool, 2 * workers)
+        block_jobs = _Jobs(pool, 2 * workers)
+        # votes table
+        for rows in stream_rows('SELECT id, voter_id, candidate, timestamp, hash FROM votes WHERE election_id=%s ORDER BY id',
+                (election_id,), batch_size):
+            ids, voter_ids, candidates, timestamps, hashes = zip(*rows)
+            vote_ids.append(np.array(ids, dtype=np.int64))
+            voter_keys.append(_voter_keys(voter_ids))
+            vote_codes.append(codes.encode(candidates))
+            hash_jobs.submit(check_vote_hashes, election_id, ids, voter_ids, candidates, timestamps, hashes)
+
+        # blocks with their linked votes, in chain order
+        link_vote_ids, link_codes, orphan_links, broken_links = [], [], [], []
+        block_count = 0
+        pending = []
+        previous_hash = None
+        current = None
+        query = '''SELECT b.id, b.block_index, b.timestamp, b.previous_hash, b.hash, b.nonce, b.seal,
+                bt.vote_id, v.election_id, v.voter_id, v.candidate, v.timestamp, v.hash
+            FROM blocks b
+            LEFT JOIN block_transactions bt ON bt.block_id = b.id
+            LEFT JOIN votes v ON v.id = bt.vote_id
+            WHERE b.election_id=%s
+            ORDER BY b.block_index, b.id, v.id'''
+        for rows in stream_rows(query, (election_id,), batch_size):
+            linked, linked_candidates = [], []
+            for (block_id, index, timestamp, block_previous, block_hash, nonce, seal,
+                    vote_id, vote_election, voter_id, candidate, vote_timestamp, vote_hash) in rows:
+                if current is None or current['id'] != block_id:
+                    if current is not None:
+                        pending.append(current)
+                    if previous_hash is not None and block_previous != previous_hash:
+                        broken_links.append(index)
+                    previous_hash = block_hash
+                    block_count += 1
+                    current = {'id': block_id, 'index': index, 'timestamp': timestamp, 'previous_hash': block_previous,
+                        'hash': block_hash, 'nonce': nonce, 'seal': seal, 'transactions': []}
+                if vote_id is None:
+                    continue
+                if vote_election != election_id:
+                    orphan_links.append({"block_index": index, "vote_id": vote_id})
+                    continue
+                current['transactions'].append({"voter_id": voter_id, "candidate": candidate,
+                    "election_id": vote_election, "timestamp": vote_timestamp, "hash": vote_hash})
+                linked.append(vote_id)
+                linked_candidates.append(candidate)
+            if linked:
+                link_vote_ids.append(np.array(linked, dtype=np.int64))
+                link_codes.append(codes.encode(linked_candidates))
+            if len(pending) >= batch_size:
+                block_jobs.submit(check_blocks, pending)
+                pending = []
+        if current is not None:
+            pending.append(current)
+        if pending:
+            block_jobs.submit(check_blocks, pending)
+
+        hash_mismatches = sorted(hash_jobs.collect())
+        invalid_blocks = [{"block_index": index, "problem": problem} for index, problem in block_jobs.collect()]
+
+    vote_ids = np.concatenate(vote_ids) if vote_ids else np.empty(0, dtype=np.int64)
+    voter_keys = np.concatenate(voter_keys) if voter_keys else np.empty(0, dtype=np.uint64)
+    vote_codes = np.concatenate(vote_codes) if vote_codes else np.empty(0, dtype=np.int64)
+    link_vote_ids = np.concatenate(link_vote_ids) if link_vote_ids else np.empty(0, dtype=np.int64)
+    link_codes = np.concatenate(link_codes) if link_codes else np.empty(0, dtype=np.int64)
+
+    vote_tally = codes.tally(np.bincount(vote_codes, minlength=len(codes.names)))
+    chain_tally = codes.tally(np.bincount(link_codes, minlength=len(codes.names)))
+    unlinked_votes = np.setdiff1d(vote_ids, link_vote_ids)
+    linked_unique, link_counts = np.unique(link_vote_ids, return_counts=True)
+    multiply_linked = linked_unique[link_counts > 1]
+    key_unique, key_counts = np.unique(voter_keys, return_counts=True)
+    duplicate_keys = set(key_unique[key_counts > 1].tolist())
+    duplicate_voters = _confirm_duplicate_voters(election_id, duplicate_keys) if duplicate_keys else []
+
+    discrepancies = {
+        "orphan_links": _sample(orphan_links),
+        "unlinked_votes": _sample(unlinked_votes.tolist()),
+        "multiply_linked_votes": _sample(multiply_linked.tolist()),
+        "duplicate_voters": _sample(duplicate_voters),
+        "hash_mismatches": _sample(hash_mismatches),
+        "invalid_blocks": _sample(invalid_blocks),
+        "broken_links": _sample(broken_links)
+    }
+    return {
+        "election_id": election_id,
+        "votes": int(len(vote_ids)),
+        "blocks": block_count,
+        "links": int(len(link_vote_ids)),
+        "vote_tally": vote_tally,
+        "chain_tally": chain_tally,
+        "tallies_match": vote_tally == chain_tally,
+        "discrepancies": discrepancies,
+        "clean": vote_tally == chain_tally and all(d['count'] == 0 for d in discrepancies.values()),
+        "duration_seconds": time.time() - started
+    }
+
+def _confirm_duplicate_voters(election_id, keys):
+    # Only the few voters whose 64-bit key collided are looked up by full hash
+    duplicates = []
+    for rows in stream_rows('''SELECT voter_id, COUNT(*) FROM votes WHERE election_id=%s
+            GROUP BY voter_id HAVING COUNT(*) > 1''', (election_id,), Config.AUDIT_BATCH_SIZE):
+        for voter_id, count in rows:
+            if int(voter_id[:16], 16) in keys:
+                duplicates.append({"voter_id": voter_id, "votes": count})
+    return duplicates
+
+# Audits started from the API, one at a time since each one already uses every core
+audit_jobs = JobRunner('audit', 1)
+
+def _audit_job(job_id, election_id):
+    return run_audit(election_id)
+
+def start_audit_job(election_id):
+    return audit_jobs.start(_audit_job, election_id, election_id=election_id)
+
+def get_audit_job(job_id):
+    return audit_jobs.get(job_id)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recount an election and cross-check votes against the chain')
+    parser.add_argument('election_id')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+    check_authority_config()
+    report = run_audit(args.election_id, args.workers, args.batch_size)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['clean'] else 1)
@@ -3,18 +3,19 @@ import json
 import time
 
 class Block:
-    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0):
+    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0, seal=''):
         self.index = index
         self.transactions = transactions
         self.timestamp = timestamp
         self.previous_hash = previous_hash
         self.nonce = nonce
+        self.seal = seal  # authority signature in poa mode, '' for mined blocks
         self.hash = self.calculate_hash()
 
     def calculate_hash(self):
         block_string = json.dumps({
             "index": self.index,
-            "transactions": [tx.to_dict() for tx in self.transactions],
+            "transactions": [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.transactions],
             "timestamp": self.timestamp,
             "previous_hash": self.previous_hash,
             "nonce": self.nonce
@@ -31,9 +32,10 @@ class Block:
     def to_dict(self):
         return {
             "index": self.index,
-            "transactions": [tx.to_dict() for tx in self.transactions],
+            "transactions": [tx.to_dict() if hasattr(tx, 'to_dict') else tx for tx in self.transactions],
             "timestamp": self.timestamp,
             "previous_hash": self.previous_hash,
             "hash": self.hash,
-            "nonce": self.nonce
+            "nonce": self.nonce,
+            "seal": self.seal
         }
\ No newline at end of file
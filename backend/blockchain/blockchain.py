@@ -1,4 +1,5 @@
 from .block import Block
+from .consensus import seal_block, verify_seal
 from .vote import Vote
 import time
 
@@ -17,7 +18,7 @@ class Blockchain:
 
     def mine_pending_transactions(self):
         block = Block(len(self.chain), self.pending_transactions, time.time(), self.get_latest_block().hash)
-        block.mine_block(self.difficulty)
+        seal_block(block)
         self.chain.append(block)
         self.pending_transactions = []
 
@@ -42,6 +43,10 @@ class Blockchain:
             if current_block.previous_hash != previous_block.hash:
                 return False
 
+            # Mined blocks need the difficulty prefix, sealed ones a valid authority signature
+            if not verify_seal(current_block):
+                return False
+
         return True
 
     def get_all_votes(self):
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+from config import Config
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+except ImportError:
+    Ed25519PrivateKey = None
+
+# Block sealing for the two consensus modes.
+# pow: the block is mined until its hash has BLOCKCHAIN_DIFFICULTY leading zeros; seal is ''.
+# poa: the block hash is signed by the authority key. The seal records the
+#      scheme ("hmac-sha256:<hex>" or "ed25519:<hex>"), and since every hash
+#      covers previous_hash the seals form a signature chain.
+# Verification looks at each block's own seal, but only accepts the scheme the
+# node is configured for (AUTHORITY_SIGNATURE): anyone holding a weaker or
+# default key could otherwise seal blocks with the other scheme. In poa mode a
+# block without a seal is rejected, since mining one only takes a few hundred
+# hashes; chains mined before switching to poa are re-sealed with
+# rebuild_blockchain.py.
+
+HMAC_PREFIX = 'hmac-sha256:'
+ED25519_PREFIX = 'ed25519:'
+
+def authority_signature():
+    # No fallback between schemes: nodes configured differently reject each other's seals
+    return 'hmac' if Config.AUTHORITY_SIGNATURE == 'hmac' else 'ed25519'
+
+def check_authority_config():
+    # Raises RuntimeError if this node can't seal or verify blocks in poa mode.
+    # Called by every entry point that appends or checks blocks.
+    if Config.CONSENSUS_MODE != 'poa':
+        return
+    if authority_signature() == 'ed25519':
+        if Ed25519PrivateKey is None:
+            raise RuntimeError("AUTHORITY_SIGNATURE=ed25519 needs the cryptography package")
+        if Config.AUTHORITY_KEY is None and not Config.AUTHORITY_PUBLIC_KEY:
+            raise RuntimeError("CONSENSUS_MODE=poa needs AUTHORITY_KEY (or AUTHORITY_PUBLIC_KEY on a node that only verifies)")
+    elif Config.AUTHORITY_KEY is None:
+        raise RuntimeError("CONSENSUS_MODE=poa with HMAC seals needs AUTHORITY_KEY")
+
+def _authority_key():
+    if Config.AUTHORITY_KEY is None:
+        raise RuntimeError("AUTHORITY_KEY is not set")
+    return Config.AUTHORITY_KEY.encode()
+
+def _ed25519_private_key():
+    # The signing key is derived from AUTHORITY_KEY so it is configured the same way as HMAC
+    return Ed25519PrivateKey.from_private_bytes(hashlib.sha256(_authority_key()).digest())
+
+def _ed25519_public_key():
+    if Config.AUTHORITY_PUBLIC_KEY:
+        return Ed25519PublicKey.from_public_bytes(bytes.fromhex(Config.AUTHORITY_PUBLIC_KEY))
+    return _ed25519_private_key().public_key()
+
+def sign_hash(block_hash):
+    if authority_signature() == 'ed25519':
+        if Ed25519PrivateKey is None:
+            raise RuntimeError("AUTHORITY_SIGNATURE=ed25519 needs the cryptography package")
+        return ED25519_PREFIX + _ed25519_private_key().sign(block_hash.encode()).hex()
+    return HMAC_PREFIX + hmac.new(_authority_key(), block_hash.encode(), hashlib.sha256).hexdigest()
+
+def check_seal(block_hash, seal):
+    # Only seals of the configured scheme are accepted; in particular a node
+    # verifying with AUTHORITY_PUBLIC_KEY never falls back to HMAC
+    if authority_signature() == 'hmac':
+        if not seal.startswith(HMAC_PREFIX) or Config.AUTHORITY_KEY is None:
+            return False
+        expected = hmac.new(_authority_key(), block_hash.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(seal[len(HMAC_PREFIX):], expected)
+    if not seal.startswith(ED25519_PREFIX) or Ed25519PrivateKey is None:
+        return False
+    if Config.AUTHORITY_KEY is None and not Config.AUTHORITY_PUBLIC_KEY:
+        return False
+    try:
+        _ed25519_public_key().verify(bytes.fromhex(seal[len(ED25519_PREFIX):]), block_hash.encode())
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+def seal_block(block):
+    # Finish a new block according to CONSENSUS_MODE; sets block.hash and block.seal
+    if Config.CONSENSUS_MODE == 'poa':
+        block.nonce = 0
+        block.hash = block.calculate_hash()
+        block.seal = sign_hash(block.hash)
+    else:
+        block.mine_block(Config.BLOCKCHAIN_DIFFICULTY)
+        block.seal = ''
+    return block
+
+def verify_seal(block):
+    # Checks the proof on a block whose hash is already known to match its contents.
+    # Genesis blocks are neither mined nor signed.
+    if block.index == 0:
+        return True
+    if block.seal:
+        return check_seal(block.hash, block.seal)
+    if Config.CONSENSUS_MODE == 'poa':
+        return False
+    return block.hash.startswith("0" * Config.BLOCKCHAIN_DIFFICULTY)
+
+def seal_problem(block):
+    # What is wrong with a block's seal, or None if verify_seal accepts it
+    if verify_seal(block):
+        return None
+    if block.seal:
+        return "invalid seal"
+    return "missing seal" if Config.CONSENSUS_MODE == 'poa' else "invalid proof of work"
@@ -1,10 +1,14 @@
 import hashlib
 import json
 
+# Fields of a vote as it is hashed into a block (Vote.to_dict)
+VOTE_FIELDS = ('voter_id', 'candidate', 'election_id', 'timestamp', 'hash')
+
 class Vote:
-    def __init__(self, voter_id, candidate, timestamp):
+    def __init__(self, voter_id, candidate, election_id, timestamp):
         self.voter_id = voter_id
         self.candidate = candidate
+        self.election_id = election_id
         self.timestamp = timestamp
         self.hash = self.calculate_hash()
 
@@ -12,6 +16,7 @@ class Vote:
         vote_string = json.dumps({
             "voter_id": self.voter_id,
             "candidate": self.candidate,
+            "election_id": self.election_id,
             "timestamp": self.timestamp
         }, sort_keys=True)
         return hashlib.sha256(vote_string.encode()).hexdigest()
@@ -20,6 +25,7 @@ class Vote:
         return {
             "voter_id": self.voter_id,
             "candidate": self.candidate,
+            "election_id": self.election_id,
             "timestamp": self.timestamp,
             "hash": self.hash
         }
\ No newline at end of file
@@ -0,0 +1,56 @@
+import threading
+import time
+from config import Config
+from db import get_db_connection
+
+SELECT_TIP_SQL = 'SELECT block_index, hash FROM blocks WHERE election_id=%s ORDER BY block_index DESC LIMIT 1'
+
+# Latest known block of each election: {election_id: (block_index, hash, checked_at)}
+# Commits in this process publish their new tip and wake long-polling readers.
+# Tips written by other processes are picked up once the cached one is older
+# than CHAIN_TIP_TTL.
+_tips = {}
+_changed = threading.Condition()
+
+def load_tip(election_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TIP_SQL, (election_id,))
+    tip = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return tuple(tip) if tip else None
+
+def publish_tip(election_id, block_index, block_hash):
+    with _changed:
+        _tips[election_id] = (block_index, block_hash, time.monotonic())
+        _changed.notify_all()
+
+def get_tip(election_id):
+    # Returns (block_index, hash) of the latest block, or None for an empty chain
+    with _changed:
+        cached = _tips.get(election_id)
+    if cached and time.monotonic() - cached[2] < Config.CHAIN_TIP_TTL:
+        return cached[:2]
+    tip = load_tip(election_id)
+    with _changed:
+        if tip is None:
+            _tips.pop(election_id, None)
+        elif cached is None or cached[:2] != tip:
+            _tips[election_id] = tip + (time.monotonic(),)
+            _changed.notify_all()
+        else:
+            _tips[election_id] = cached[:2] + (time.monotonic(),)
+    return tip
+
+def wait_for_new_tip(election_id, known_index, timeout):
+    # Block until the chain grows past known_index or the timeout expires
+    deadline = time.monotonic() + timeout
+    while True:
+        tip = get_tip(election_id)
+        tip_index = tip[0] if tip else -1
+        remaining = deadline - time.monotonic()
+        if tip_index > known_index or remaining <= 0:
+            return tip
+        with _changed:
+            _changed.wait(min(remaining, Config.CHAIN_TIP_TTL))
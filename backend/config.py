@@ -4,4 +4,51 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-for-blockchain-voting'
     BLOCKCHAIN_DIFFICULTY = 2
     MINING_INTERVAL = 10  # seconds
-    ADMIN_KEY = os.environ.get('ADMIN_KEY') or 'admin123'
\ No newline at end of file
+    ADMIN_KEY = os.environ.get('ADMIN_KEY') or 'admin123'
+    # Sealed results of completed elections
+    SEALED_RESULTS_DIR = os.environ.get('SEALED_RESULTS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sealed_results')
+    SEALED_CACHE_SIZE = 64  # elections kept in memory, the rest are read from disk
+    # Election metadata cache on the vote path
+    ELECTION_CACHE_TTL = 30  # seconds, bounds staleness across processes
+    # Async ingestion server (async_server.py)
+    ASYNC_PORT = 5002
+    ASYNC_DB_POOL_SIZE = 50
+    MINING_WORKERS = os.cpu_count() or 1
+    # Admission control for /vote (admission.py)
+    ADMISSION_QUEUE_SIZE = 2000  # split evenly between the shards
+    ADMISSION_SHARDS = os.cpu_count() or 4  # one commit worker each, elections are hashed to a shard
+    ADMISSION_BATCH_SIZE = 50
+    ADMISSION_RATE_PER_ELECTION = 500  # votes per second
+    ADMISSION_BURST = 1000
+    ADMISSION_RETRY_AFTER = 1  # seconds
+    ADMISSION_WAIT_TIMEOUT = 30  # seconds a request waits for its vote to commit
+    # Single-voter lookup cache (voter_cache.py)
+    VOTER_CACHE_SIZE = 100000
+    VOTER_CACHE_TTL = 60  # seconds
+    VOTER_NEGATIVE_TTL = 10  # seconds an unknown voter ID stays cached
+    OTP_SEND_WORKERS = 4
+    # Delta sync of /chain (chain_tips.py)
+    CHAIN_TIP_TTL = 1  # seconds a chain tip read from the DB is trusted
+    CHAIN_LONG_POLL_MAX = 25  # seconds a /chain?wait= request may be held
+    # Block sealing: 'pow' mines blocks to BLOCKCHAIN_DIFFICULTY, 'poa' signs them with the authority key
+    CONSENSUS_MODE = os.environ.get('CONSENSUS_MODE') or 'pow'
+    # Secret behind both seal schemes; required in poa mode except on nodes that only verify Ed25519 seals
+    AUTHORITY_KEY = os.environ.get('AUTHORITY_KEY')
+    # 'ed25519' (needs the cryptography package) or 'hmac'; blocks sealed with the other scheme are rejected
+    AUTHORITY_SIGNATURE = os.environ.get('AUTHORITY_SIGNATURE') or 'ed25519'
+    # Hex Ed25519 public key, lets a node verify blocks without holding AUTHORITY_KEY
+    AUTHORITY_PUBLIC_KEY = os.environ.get('AUTHORITY_PUBLIC_KEY')
+    # Read replicas (replication.py)
+    REPLICATION_PRIMARY_URL = os.environ.get('REPLICATION_PRIMARY_URL') or 'http://127.0.0.1:5000'
+    REPLICA_BATCH_SIZE = 500  # blocks per pull
+    REPLICA_SYNC_INTERVAL = 1  # seconds between pulls once caught up
+    # Audit recount (audit.py)
+    AUDIT_BATCH_SIZE = 50000  # rows per streamed batch
+    AUDIT_SAMPLE_LIMIT = 100  # examples listed per discrepancy
+    # Columnar export (export.py)
+    EXPORT_DIR = os.environ.get('EXPORT_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exports')
+    EXPORT_CHUNK_ROWS = 50000  # rows per streamed chunk
+    EXPORT_WORKERS = 2
+    # Startup warm-up (warmup.py)
+    WARM_CACHES = os.environ.get('WARM_CACHES', '1') != '0'
+    WARMUP_WORKERS = 8  # elections warmed in parallel
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from config import Config
+from db import get_db_connection
+
+# Per-election metadata used to pre-validate votes without DB round trips:
+# {election_id: {'status', 'start_time', 'end_time', 'candidates', 'approved_voters', 'loaded_at'}}
+# Entries are refreshed by manage_election/approve_voter in this process and
+# expire after ELECTION_CACHE_TTL so changes made by other processes show up.
+_elections = {}
+# Loads in flight: {election_id: {'done': Event, 'entry', 'error', 'stale'}}
+_loading = {}
+_lock = threading.Lock()
+
+def _load_election(election_id):
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('SELECT status, start_time, end_time, candidates FROM elections WHERE election_id=%s', (election_id,))
+    election = cursor.fetchone()
+    if not election:
+        cursor.close()
+        conn.close()
+        return None
+    cursor.execute('''SELECT ev.voter_id FROM election_voters ev JOIN voters v ON v.hashed_id = ev.voter_id
+        WHERE ev.election_id=%s AND ev.status=%s AND v.status=%s''', (election_id, 'approved', 'Active'))
+    approved_voters = {row['voter_id'] for row in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+    return {
+        'status': election['status'],
+        'start_time': election['start_time'],
+        'end_time': election['end_time'],
+        'candidates': frozenset(json.loads(election['candidates']) if election['candidates'] else []),
+        'approved_voters': approved_voters,
+        'loaded_at': time.time()
+    }
+
+def get_election_meta(election_id):
+    # One thread reloads an expired entry while the others keep using the old one.
+    # Without any entry, callers wait for the load already in flight.
+    with _lock:
+        entry = _elections.get(election_id)
+        if entry and time.time() - entry['loaded_at'] < Config.ELECTION_CACHE_TTL:
+            return entry
+        flight = _loading.get(election_id)
+        owner = flight is None
+        if owner:
+            flight = _loading[election_id] = {'done': threading.Event(), 'entry': None, 'error': None, 'stale': False}
+    if not owner:
+        if entry:
+            return entry
+        flight['done'].wait()
+        if flight['error']:
+            raise flight['error']
+        return flight['entry']
+    try:
+        entry = _load_election(election_id)
+        flight['entry'] = entry
+        with _lock:
+            # An entry changed while it was being read is loaded again by the next caller
+            if not flight['stale']:
+                if entry:
+                    _elections[election_id] = entry
+                else:
+                    _elections.pop(election_id, None)
+        return entry
+    except Exception as e:
+        flight['error'] = e
+        raise
+    finally:
+        with _lock:
+            _loading.pop(election_id, None)
+        flight['done'].set()
+
+def get_voting_status(meta):
+    now = time.time()
+    if meta['status'] == "suspended":
+        return "suspended"
+    elif now < meta['start_time']:
+        return "upcoming"
+    elif now > meta['end_time']:
+        return "completed"
+    else:
+        return "active"
+
+def _mark_stale(election_id):
+    flight = _loading.get(election_id)
+    if flight:
+        flight['stale'] = True
+
+def invalidate_election(election_id):
+    with _lock:
+        _elections.pop(election_id, None)
+        _mark_stale(election_id)
+
+def add_approved_voter(election_id, voter_hash):
+    with _lock:
+        entry = _elections.get(election_id)
+        if entry:
+            entry['approved_voters'].add(voter_hash)
+        _mark_stale(election_id)
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import struct
+import sys
+from array import array
+from config import Config
+from db import stream_rows
+from jobs import JobRunner
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Columnar export of an election's votes, blocks and block_transactions rows.
+# Rows are streamed from MySQL and written chunk by chunk, so memory use is
+# bounded by EXPORT_CHUNK_ROWS whatever the size of the election. Each table
+# becomes one file in the output directory: Parquet when pyarrow is
+# installed, otherwise the chunked column format below (.bvc).
+#
+# .bvc layout (little endian):
+#   b'BVCOL1\n'
+#   header: one JSON line {"table": ..., "columns": [[name, type], ...]}, type is int64, float64 or string
+#   chunks: uint32 row count (0 ends the file), then every column in order:
+#     int64/float64: the raw values
+#     string:        int64 offsets (rows + 1), uint64 data length, UTF-8 data
+#
+#   python export.py <election_id> <output_dir> [--candidate NAME] [--start TS] [--end TS]
+
+MAGIC = b'BVCOL1\n'
+
+TABLES = {
+    'votes': [('id', 'int64'), ('voter_id', 'string'), ('candidate', 'string'), ('timestamp', 'float64'), ('hash', 'string')],
+    'blocks': [('id', 'int64'), ('block_index', 'int64'), ('timestamp', 'float64'), ('previous_hash', 'string'),
+        ('hash', 'string'), ('nonce', 'int64'), ('seal', 'string')],
+    'block_transactions': [('block_id', 'int64'), ('vote_id', 'int64')]
+}
+
+def _queries(election_id, candidate=None, start=None, end=None):
+    # Candidate and time filters apply to votes and their links, the time filter to blocks too
+    vote_filter, vote_params = '', []
+    if candidate is not None:
+        vote_filter += ' AND v.candidate=%s'
+        vote_params.append(candidate)
+    if start is not None:
+        vote_filter += ' AND v.timestamp >= %s'
+        vote_params.append(start)
+    if end is not None:
+        vote_filter += ' AND v.timestamp < %s'
+        vote_params.append(end)
+    block_filter, block_params = '', []
+    if start is not None:
+        block_filter += ' AND b.timestamp >= %s'
+        block_params.append(start)
+    if end is not None:
+        block_filter += ' AND b.timestamp < %s'
+        block_params.append(end)
+    return {
+        'votes': (f'''SELECT v.id, v.voter_id, v.candidate, v.timestamp, v.hash FROM votes v
+            WHERE v.election_id=%s{vote_filter} ORDER BY v.id''', [election_id] + vote_params),
+        'blocks': (f'''SELECT b.id, b.block_index, b.timestamp, b.previous_hash, b.hash, b.nonce, b.seal FROM blocks b
+            WHERE b.election_id=%s{block_filter} ORDER BY b.block_index, b.id''', [election_id] + block_params),
+        'block_transactions': (f'''SELECT bt.block_id, bt.vote_id FROM block_transactions bt
+            JOIN blocks b ON b.id = bt.block_id JOIN votes v ON v.id = bt.vote_id
+            WHERE b.election_id=%s{vote_filter} ORDER BY bt.block_id, bt.vote_id''', [election_id] + vote_params)
+    }
+
+def _little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+class ColumnarWriter:
+    def __init__(self, path, table, columns):
+        self.columns = columns
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.file.write(json.dumps({"table": table, "columns": columns}).encode() + b'\n')
+
+    def write_chunk(self, column_values):
+        rows = len(column_values[0])
+        self.file.write(struct.pack('<I', rows))
+        for (name, kind), values in zip(self.columns, column_values):
+            if kind == 'int64':
+                self.file.write(_little_endian(array('q', values)))
+            elif kind == 'float64':
+                self.file.write(_little_endian(array('d', values)))
+            else:
+                encoded = [(value or '').encode() for value in values]
+                offsets = array('q', [0])
+                for item in encoded:
+                    offsets.append(offsets[-1] + len(item))
+                self.file.write(_little_endian(offsets))
+                self.file.write(struct.pack('<Q', offsets[-1]))
+                self.file.write(b''.join(encoded))
+
+    def close(self):
+        self.file.write(struct.pack('<I', 0))
+        self.file.close()
+
+class ParquetWriter:
+    TYPES = {'int64': 'int64', 'float64': 'float64', 'string': 'string'}
+
+    def __init__(self, path, table, columns):
+        self.names = [name for name, _ in columns]
+        self.schema = pa.schema([(name, getattr(pa, self.TYPES[kind])()) for name, kind in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_chunk(self, column_values):
+        self.writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=self.schema.field(name).type) for name, values in zip(self.names, column_values)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def read_columnar(path):
+    # Yields each chunk of a .bvc file as {column: list of values}
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a columnar export")
+        columns = json.loads(f.readline())['columns']
+        while True:
+            rows = struct.unpack('<I', f.read(4))[0]
+            if rows == 0:
+                return
+            chunk = {}
+            for name, kind in columns:
+                if kind in ('int64', 'float64'):
+                    values = array('q' if kind == 'int64' else 'd')
+                    values.frombytes(f.read(8 * rows))
+                    if sys.byteorder == 'big':
+                        values.byteswap()
+                    chunk[name] = values.tolist()
+                else:
+                    offsets = array('q')
+                    offsets.frombytes(f.read(8 * (rows + 1)))
+                    if sys.byteorder == 'big':
+                        offsets.byteswap()
+                    data = f.read(struct.unpack('<Q', f.read(8))[0])
+                    chunk[name] = [data[offsets[i]:offsets[i + 1]].decode() for i in range(rows)]
+            yield chunk
+
+def export_election(election_id, output_dir, candidate=None, start=None, end=None, chunk_rows=None):
+    # Returns {table: {"path": ..., "rows": ...}}
+    chunk_rows = chunk_rows or Config.EXPORT_CHUNK_ROWS
+    os.makedirs(output_dir, exist_ok=True)
+    extension, writer_class = ('.parquet', ParquetWriter) if pa is not None else ('.bvc', ColumnarWriter)
+    files = {}
+    for table, (query, params) in _queries(election_id, candidate, start, end).items():
+        path = os.path.join(output_dir, table + extension)
+        writer = writer_class(path, table, TABLES[table])
+        rows_written = 0
+        try:
+            for rows in stream_rows(query, params, chunk_rows):
+                writer.write_chunk([list(column) for column in zip(*rows)])
+                rows_written += len(rows)
+        finally:
+            writer.close()
+        files[table] = {"path": path, "rows": rows_written}
+    return files
+
+# Exports started from the API; a job's result is export_election's return value
+export_jobs = JobRunner('export', Config.EXPORT_WORKERS)
+
+def _export_job(job_id, election_id, candidate, start, end):
+    return export_election(election_id, os.path.join(Config.EXPORT_DIR, job_id), candidate, start, end)
+
+def start_export_job(election_id, candidate=None, start=None, end=None):
+    return export_jobs.start(_export_job, election_id, candidate, start, end, election_id=election_id)
+
+def get_export_job(job_id):
+    return export_jobs.get(job_id)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export an election's votes, blocks and links to columnar files")
+    parser.add_argument('election_id')
+    parser.add_argument('output_dir')
+    parser.add_argument('--candidate', default=None)
+    parser.add_argument('--start', type=float, default=None, help='only rows with timestamp >= START')
+    parser.add_argument('--end', type=float, default=None, help='only rows with timestamp < END')
+    args = parser.parse_args()
+    for table, info in export_election(args.election_id, args.output_dir, args.candidate, args.start, args.end).items():
+        print(f"{table}: {info['rows']} rows -> {info['path']}")
@@ -1,9 +1,36 @@
 import mysql.connector
 from db import get_db_connection
 
+# Bumped whenever initialize_db creates or changes something, so servers can
+# skip the DDL when the database is already up to date.
+# 1: base tables  2: blocks.seal  3: turnout_rollups  4: uniq_election_block
+SCHEMA_VERSION = 4
+
+def get_schema_version():
+    # Version recorded by the last complete initialize_db, 0 for a database that predates it
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT version FROM schema_version WHERE id = 1')
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    except mysql.connector.ProgrammingError:
+        return 0
+    finally:
+        cursor.close()
+        conn.close()
+
+def ensure_schema():
+    # Only runs the DDL when the stored version is behind SCHEMA_VERSION
+    if get_schema_version() >= SCHEMA_VERSION:
+        return False
+    initialize_db()
+    return True
+
 def initialize_db():
     conn = get_db_connection()
     cursor = conn.cursor()
+    complete = True
     # Create elections table with election_id as VARCHAR(255) PRIMARY KEY
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS elections (
@@ -50,9 +77,26 @@ def initialize_db():
             previous_hash VARCHAR(255) NOT NULL,
             hash VARCHAR(255) NOT NULL,
             nonce INT NOT NULL,
+            seal VARCHAR(255) NOT NULL DEFAULT '',
+            UNIQUE KEY uniq_election_block (election_id, block_index),
             FOREIGN KEY (election_id) REFERENCES elections(election_id)
         )
     ''')
+    # Databases created before proof-of-authority sealing have no seal column
+    cursor.execute('''SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'blocks' AND column_name = 'seal' ''')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("ALTER TABLE blocks ADD COLUMN seal VARCHAR(255) NOT NULL DEFAULT ''")
+    # One block per index and election, so concurrent appends can't fork a chain
+    cursor.execute('''SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'blocks' AND index_name = 'uniq_election_block' ''')
+    if cursor.fetchone()[0] == 0:
+        cursor.execute('SELECT election_id FROM blocks GROUP BY election_id, block_index HAVING COUNT(*) > 1 LIMIT 1')
+        if cursor.fetchone():
+            print("Some chains are forked; votes are committed under the tip lock until rebuild_blockchain.py has run and the database is initialized again")
+            complete = False
+        else:
+            cursor.execute('ALTER TABLE blocks ADD UNIQUE KEY uniq_election_block (election_id, block_index)')
     # Create block_transactions table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS block_transactions (
@@ -73,6 +117,25 @@ def initialize_db():
             FOREIGN KEY (voter_id) REFERENCES voters(hashed_id)
         )
     ''')
+    # Per-minute and per-hour vote counts, maintained on every vote (see turnout.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS turnout_rollups (
+            election_id VARCHAR(255) NOT NULL,
+            granularity VARCHAR(10) NOT NULL,
+            bucket_start BIGINT NOT NULL,
+            candidate VARCHAR(255) NOT NULL,
+            votes INT NOT NULL,
+            PRIMARY KEY (election_id, granularity, bucket_start, candidate)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            id TINYINT PRIMARY KEY,
+            version INT NOT NULL
+        )
+    ''')
+    if complete:
+        cursor.execute('REPLACE INTO schema_version (id, version) VALUES (1, %s)', (SCHEMA_VERSION,))
     conn.commit()
     cursor.close()
     conn.close()
@@ -0,0 +1,39 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Long-running work started from the API (exports, audits). A job runs on the
+# runner's own pool so it never occupies a request thread; its state is polled
+# with get(job_id):
+# {"job_id", "status": queued|running|done|failed, "result", "error", "created_at", "finished_at", **info}
+
+class JobRunner:
+    def __init__(self, name, workers):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def start(self, func, *args, **info):
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "status": "queued", "result": None, "error": None,
+            "created_at": time.time(), "finished_at": None, **info}
+        with self.lock:
+            self.jobs[job_id] = job
+
+        def run():
+            job['status'] = "running"
+            try:
+                job['result'] = func(job_id, *args)
+                job['status'] = "done"
+            except Exception as e:
+                job['status'] = "failed"
+                job['error'] = str(e)
+            job['finished_at'] = time.time()
+
+        self.pool.submit(run)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
@@ -2,6 +2,8 @@ import smtplib
 from email.mime.text import MIMEText
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
 
 # In-memory OTP store: {email: (otp, expiry_time)}
 otp_store = {}
@@ -21,14 +23,31 @@ def send_otp_email(recipient_email, otp_code):
         server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
         server.sendmail(EMAIL_ADDRESS, recipient_email, msg.as_string())
 
-# Generate and store OTP (always overwrite previous OTP for the email)
-def generate_and_store_otp(email):
+# Background senders for queue_otp
+otp_send_pool = ThreadPoolExecutor(max_workers=Config.OTP_SEND_WORKERS)
+
+def store_new_otp(email):
     otp = str(random.randint(100000, 999999))
     expiry = time.time() + 300  # OTP valid for 5 minutes
     otp_store[email] = (otp, expiry)
+    return otp
+
+# Generate and store OTP (always overwrite previous OTP for the email)
+def generate_and_store_otp(email):
+    otp = store_new_otp(email)
     send_otp_email(email, otp)
     return otp
 
+def report_send_failure(future):
+    if future.exception():
+        print(f"Failed to send OTP: {future.exception()}")
+
+# Same as generate_and_store_otp, but the email is sent in the background
+def queue_otp(email):
+    otp = store_new_otp(email)
+    otp_send_pool.submit(send_otp_email, email, otp).add_done_callback(report_send_failure)
+    return otp
+
 # Verify OTP (accept latest OTP if not expired, allow retry after wrong attempt)
 def verify_otp(email, otp):
     if email in otp_store:
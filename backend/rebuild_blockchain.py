@@ -1,33 +1,9 @@
+import sys
 import time
-import hashlib
-import json
 from db import get_db_connection
-
-class Block:
-    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0):
-        self.index = index
-        self.transactions = transactions
-        self.timestamp = timestamp
-        self.previous_hash = previous_hash
-        self.nonce = nonce
-        self.hash = self.calculate_hash()
-
-    def calculate_hash(self):
-        block_string = json.dumps({
-            "index": self.index,
-            "transactions": [tx for tx in self.transactions],
-            "timestamp": self.timestamp,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
-
-    def mine_block(self, difficulty):
-        target = "0" * difficulty
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
-        return self.hash
+from blockchain.block import Block
+from blockchain.consensus import check_authority_config, seal_block, seal_problem
+from sealed_results import discard_sealed
 
 def reconstruct_blockchain():
     conn = get_db_connection()
@@ -42,29 +18,73 @@ def reconstruct_blockchain():
         cursor.execute('SELECT * FROM votes WHERE election_id=%s ORDER BY timestamp', (election_id,))
         votes = cursor.fetchall()
         chain = []
-        difficulty = 2
         # Genesis block
         genesis_block = Block(0, [], time.time(), "0")
         chain.append(genesis_block)
         # Save genesis block
-        cursor.execute('''INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce) VALUES (%s, %s, %s, %s, %s, %s)''',
-            (election_id, genesis_block.index, genesis_block.timestamp, genesis_block.previous_hash, genesis_block.hash, genesis_block.nonce))
+        cursor.execute('''INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce, seal) VALUES (%s, %s, %s, %s, %s, %s, %s)''',
+            (election_id, genesis_block.index, genesis_block.timestamp, genesis_block.previous_hash, genesis_block.hash, genesis_block.nonce, genesis_block.seal))
         genesis_block_id = cursor.lastrowid
         # For each vote, create a block
         for i, vote in enumerate(votes):
-            block = Block(i+1, [vote], vote['timestamp'], chain[-1].hash)
-            block.mine_block(difficulty)
+            # Hash the vote in the same form the API puts in a block (Vote.to_dict)
+            transaction = {field: vote[field] for field in ('voter_id', 'candidate', 'election_id', 'timestamp', 'hash')}
+            block = Block(i+1, [transaction], vote['timestamp'], chain[-1].hash)
+            # Mined or signed according to CONSENSUS_MODE
+            seal_block(block)
             chain.append(block)
             # Save block
-            cursor.execute('''INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce) VALUES (%s, %s, %s, %s, %s, %s)''',
-                (election_id, block.index, block.timestamp, block.previous_hash, block.hash, block.nonce))
+            cursor.execute('''INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce, seal) VALUES (%s, %s, %s, %s, %s, %s, %s)''',
+                (election_id, block.index, block.timestamp, block.previous_hash, block.hash, block.nonce, block.seal))
             block_id = cursor.lastrowid
             # Save block_transactions
             cursor.execute('INSERT INTO block_transactions (block_id, vote_id) VALUES (%s, %s)', (block_id, vote['id']))
     conn.commit()
     cursor.close()
     conn.close()
+    # Block hashes changed, so sealed results are re-sealed on their next read
+    for election_id in elections:
+        discard_sealed(election_id)
     print("Blockchain reconstructed and saved for all elections.")
 
+def verify_blockchain():
+    # Check every stored chain without modifying it; works for mined and signed blocks
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('SELECT election_id FROM elections')
+    elections = [row['election_id'] for row in cursor.fetchall()]
+    all_valid = True
+    for election_id in elections:
+        cursor.execute('SELECT * FROM blocks WHERE election_id=%s ORDER BY block_index', (election_id,))
+        blocks = cursor.fetchall()
+        problem = None
+        previous = None
+        for row in blocks:
+            cursor.execute('''SELECT v.voter_id, v.candidate, v.election_id, v.timestamp, v.hash FROM block_transactions bt
+                JOIN votes v ON bt.vote_id = v.id WHERE bt.block_id=%s ORDER BY v.id''', (row['id'],))
+            block = Block(row['block_index'], cursor.fetchall(), row['timestamp'], row['previous_hash'], row['nonce'], row['seal'])
+            if block.hash != row['hash']:
+                problem = f"block {row['block_index']} hash does not match its contents"
+            elif previous and row['previous_hash'] != previous['hash']:
+                problem = f"block {row['block_index']} does not link to block {previous['block_index']}"
+            else:
+                seal_issue = seal_problem(block)
+                if seal_issue:
+                    problem = f"block {row['block_index']}: {seal_issue}"
+            if problem:
+                break
+            previous = row
+        if problem:
+            all_valid = False
+            print(f"{election_id}: INVALID, {problem}")
+        else:
+            print(f"{election_id}: valid ({len(blocks)} blocks)")
+    cursor.close()
+    conn.close()
+    return all_valid
+
 if __name__ == "__main__":
+    check_authority_config()
+    if "--verify" in sys.argv:
+        sys.exit(0 if verify_blockchain() else 1)
     reconstruct_blockchain()
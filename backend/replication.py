@@ -0,0 +1,309 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from flask import Flask, request, jsonify
+from flask_cors import CORS
+from blockchain.block import Block
+from blockchain.consensus import check_authority_config, seal_problem
+from blockchain.vote import VOTE_FIELDS
+from config import Config
+
+# Read replicas. A replica pulls blocks from the primary's
+# /replication/blocks/<election_id> in batches and checks each block against
+# the previous one, its hash and its seal before accepting it. Accepted blocks
+# are appended to a file per election, so a restarted replica only pulls what
+# it missed. /chain, /results and /verify are then served from memory without
+# touching MySQL.
+#
+#   python replication.py --primary http://127.0.0.1:5000 --port 5010 --data-dir replica_5010
+
+class ReplicationError(Exception):
+    pass
+
+class ChainReplica:
+    # Replicated chain and running tally of one election
+    def __init__(self, election_id, path):
+        self.election_id = election_id
+        self.path = path
+        self.blocks = []
+        self.results = {}
+        self.voters = set()
+        self.primary_tip = -1
+        self.last_sync = None
+        self.error = None
+
+    @property
+    def tip_index(self):
+        return self.blocks[-1]['index'] if self.blocks else -1
+
+    @property
+    def tip_hash(self):
+        return self.blocks[-1]['hash'] if self.blocks else None
+
+    def check(self, block):
+        previous = self.blocks[-1] if self.blocks else None
+        if previous and block['previous_hash'] != previous['hash']:
+            return f"block {block['index']} does not link to block {previous['index']}"
+        transactions = [{field: tx[field] for field in VOTE_FIELDS} for tx in block['transactions']]
+        rebuilt = Block(block['index'], transactions, block['timestamp'], block['previous_hash'], block['nonce'], block.get('seal', ''))
+        if rebuilt.hash != block['hash']:
+            return f"block {block['index']} hash does not match its contents"
+        problem = seal_problem(rebuilt)
+        if problem:
+            return f"block {block['index']}: {problem}"
+        return None
+
+    def append(self, block, persist=True):
+        problem = self.check(block)
+        if problem:
+            raise ReplicationError(problem)
+        self.blocks.append(block)
+        for tx in block['transactions']:
+            self.results[tx['candidate']] = self.results.get(tx['candidate'], 0) + 1
+            self.voters.add(tx['voter_id'])
+        if persist:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(block) + '\n')
+
+    def reset(self):
+        self.blocks = []
+        self.results = {}
+        self.voters = set()
+        self.error = None
+        with open(self.path, 'w') as f:
+            f.write(json.dumps({"election_id": self.election_id}) + '\n')
+
+    def load(self):
+        # Replay the local file; anything that no longer verifies is pulled again
+        with open(self.path) as f:
+            f.readline()  # header
+            try:
+                for line in f:
+                    self.append(json.loads(line), persist=False)
+            except (ValueError, ReplicationError) as e:
+                print(f"Discarding local chain of {self.election_id}: {e}")
+                self.reset()
+
+    def block_at(self, index):
+        # Blocks are stored in index order starting from genesis
+        if 0 <= index < len(self.blocks) and self.blocks[index]['index'] == index:
+            return self.blocks[index]
+        return None
+
+    def diverged_from(self, tip_index, tip_hash):
+        # True if the primary's tip is not on our chain. A tip behind ours that we
+        # hold is only a stale tip cache on the primary.
+        if tip_index < 0:
+            return bool(self.blocks)
+        local = self.block_at(tip_index)
+        return local is not None and local['hash'] != tip_hash
+
+    def blocks_after(self, since):
+        position = len(self.blocks)
+        while position > 0 and self.blocks[position - 1]['index'] > since:
+            position -= 1
+        return self.blocks[position:]
+
+class Replica:
+    def __init__(self, primary_url, data_dir):
+        check_authority_config()
+        self.primary_url = primary_url.rstrip('/')
+        self.data_dir = data_dir
+        self.chains = {}
+        self.elections = []
+        # Held while a chain is modified; notified whenever blocks are appended
+        self.changed = threading.Condition()
+        self.listeners = []
+        os.makedirs(data_dir, exist_ok=True)
+        for file_name in os.listdir(data_dir):
+            if file_name.endswith('.jsonl'):
+                path = os.path.join(data_dir, file_name)
+                with open(path) as f:
+                    election_id = json.loads(f.readline())['election_id']
+                chain = ChainReplica(election_id, path)
+                chain.load()
+                self.chains[election_id] = chain
+
+    def get_chain(self, election_id):
+        return self.chains.get(election_id)
+
+    def _chain(self, election_id):
+        chain = self.chains.get(election_id)
+        if chain is None:
+            file_name = hashlib.sha256(election_id.encode()).hexdigest() + '.jsonl'
+            chain = ChainReplica(election_id, os.path.join(self.data_dir, file_name))
+            chain.reset()
+            self.chains[election_id] = chain
+        return chain
+
+    def _fetch(self, path, params=None):
+        url = self.primary_url + path
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return json.loads(response.read())
+
+    def on_new_blocks(self, listener):
+        # listener(election_id, blocks) is called after blocks are appended
+        self.listeners.append(listener)
+
+    def sync_once(self):
+        self.elections = self._fetch('/elections')
+        for election in self.elections:
+            self.sync_election(election['election_id'])
+
+    def sync_election(self, election_id):
+        chain = self._chain(election_id)
+        if chain.error:
+            return
+        while True:
+            batch = self._fetch(f"/replication/blocks/{urllib.parse.quote(election_id, safe='')}",
+                {'since': chain.tip_index, 'limit': Config.REPLICA_BATCH_SIZE})
+            chain.primary_tip = batch['tip_index']
+            blocks = batch['blocks']
+            if ((blocks and chain.blocks and blocks[0]['previous_hash'] != chain.tip_hash)
+                    or chain.diverged_from(batch['tip_index'], batch['tip_hash'])):
+                # The primary's chain no longer extends ours (e.g. it was rebuilt)
+                print(f"Chain of {election_id} diverged from the primary, pulling it again")
+                with self.changed:
+                    chain.reset()
+                continue
+            with self.changed:
+                try:
+                    for block in blocks:
+                        chain.append(block)
+                except ReplicationError as e:
+                    # Keep serving what verified and stop pulling a chain we can't trust
+                    chain.error = str(e)
+                    print(f"Rejected block from primary for {election_id}: {e}")
+                self.changed.notify_all()
+            chain.last_sync = time.time()
+            if blocks:
+                for listener in self.listeners:
+                    listener(election_id, blocks)
+            if chain.error or not blocks or chain.tip_index >= batch['tip_index']:
+                return
+
+    def run(self):
+        while True:
+            try:
+                self.sync_once()
+            except Exception as e:
+                print(f"Replication from {self.primary_url} failed: {e}")
+            time.sleep(Config.REPLICA_SYNC_INTERVAL)
+
+    def start(self):
+        threading.Thread(target=self.run, name='replication', daemon=True).start()
+
+    def wait_for_blocks(self, election_id, since, timeout):
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                chain = self.chains.get(election_id)
+                remaining = deadline - time.monotonic()
+                if (chain and chain.tip_index > since) or remaining <= 0:
+                    return
+                self.changed.wait(remaining)
+
+    def status(self):
+        now = time.time()
+        elections = {}
+        for election_id, chain in list(self.chains.items()):
+            elections[election_id] = {
+                "local_tip": chain.tip_index,
+                "primary_tip": chain.primary_tip,
+                "blocks_behind": max(chain.primary_tip - chain.tip_index, 0),
+                "seconds_since_sync": now - chain.last_sync if chain.last_sync else None,
+                "error": chain.error
+            }
+        return {
+            "primary": self.primary_url,
+            "elections": elections,
+            "max_blocks_behind": max((e['blocks_behind'] for e in elections.values()), default=0)
+        }
+
+def create_replica_app(replica):
+    app = Flask(__name__)
+    CORS(app)
+
+    @app.route('/elections', methods=['GET'])
+    def get_elections():
+        return jsonify(replica.elections), 200
+
+    @app.route('/chain/<election_id>', methods=['GET'])
+    def get_chain(election_id):
+        # Same contract as the primary, including ?since=, ?since_hash= and ?wait=
+        since = request.args.get('since', type=int)
+        since_hash = request.args.get('since_hash')
+        wait = min(request.args.get('wait', default=0, type=float), Config.CHAIN_LONG_POLL_MAX)
+        chain = replica.get_chain(election_id)
+        blocks = chain.blocks if chain else []
+        if since is None and since_hash is None:
+            return jsonify({"chain": blocks, "length": len(blocks), "election_id": election_id}), 200
+        reset = False
+        if since_hash is not None:
+            known = [block['index'] for block in blocks if block['hash'] == since_hash]
+            since = known[0] if known else -1
+            reset = not known
+        tip_index = chain.tip_index if chain else -1
+        if tip_index <= since and wait > 0:
+            replica.wait_for_blocks(election_id, since, wait)
+            chain = replica.get_chain(election_id)
+            tip_index = chain.tip_index if chain else -1
+        if tip_index <= since and not reset:
+            return app.response_class(status=304)
+        new_blocks = chain.blocks_after(since) if chain else []
+        return jsonify({
+            "chain": new_blocks,
+            "length": len(new_blocks),
+            "election_id": election_id,
+            "since": since,
+            "reset": reset
+        }), 200
+
+    @app.route('/results/<election_id>', methods=['GET'])
+    def get_results(election_id):
+        chain = replica.get_chain(election_id)
+        if not chain:
+            return jsonify({"results": {}, "voter_turnout_count": 0}), 200
+        with replica.changed:
+            results = dict(chain.results)
+            turnout = len(chain.voters)
+        return jsonify({"results": results, "voter_turnout_count": turnout}), 200
+
+    @app.route('/verify/<election_id>', methods=['GET'])
+    def verify_chain(election_id):
+        # Every block was verified when it was replicated
+        chain = replica.get_chain(election_id)
+        return jsonify({
+            "election_id": election_id,
+            "valid": chain.error is None if chain else True,
+            "length": len(chain.blocks) if chain else 0,
+            "chain_root": chain.tip_hash if chain and chain.blocks else "0"
+        }), 200
+
+    @app.route('/replication/status', methods=['GET'])
+    def replication_status():
+        return jsonify(replica.status()), 200
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        return jsonify({"status": "healthy", "role": "replica", "timestamp": time.time()}), 200
+
+    return app
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a read replica of the voting chain')
+    parser.add_argument('--primary', default=Config.REPLICATION_PRIMARY_URL)
+    parser.add_argument('--port', type=int, default=5010)
+    parser.add_argument('--data-dir', default=None)
+    args = parser.parse_args()
+    replica = Replica(args.primary, args.data_dir or f'replica_{args.port}')
+    replica.start()
+    print(f"Replicating {args.primary}, serving reads on port {args.port}...")
+    create_replica_app(replica).run(host='0.0.0.0', port=args.port, threaded=True)
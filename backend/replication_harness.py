@@ -0,0 +1,247 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server
+from blockchain.block import Block
+from blockchain.consensus import seal_block
+from blockchain.vote import Vote
+
+# End-to-end check of read replicas on localhost, without MySQL. A stand-in
+# primary serves /elections and /replication/blocks from in-memory chains, and
+# replication.py replicas run as separate processes against it. Checks:
+#   catch-up        every replica reaches the primary's tip with matching results
+#   long poll       /chain?since=<tip>&wait= returns a block appended meanwhile
+#   restart         a restarted replica only pulls the blocks it missed
+#   rebuild         a chain rebuilt with the same length replaces the local one
+#   tampering       a forged block is rejected and /verify reports it
+#
+#   python replication_harness.py [--replicas 2] [--votes 200]
+
+class StandInPrimary:
+    def __init__(self, port):
+        self.port = port
+        self.chains = {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.app = self._create_app()
+        self.server = make_server('127.0.0.1', port, self.app, threaded=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def rebuild(self, election_id):
+        # Fresh genesis timestamp, so every block hash changes but the length doesn't
+        with self.lock:
+            votes = [block['transactions'][0] for block in self.chains.get(election_id, [])[1:]]
+            genesis = Block(0, [], time.time(), "0")
+            self.chains[election_id] = [genesis.to_dict()]
+        for tx in votes:
+            self.append(election_id, tx['voter_id'], tx['candidate'], tx['timestamp'])
+
+    def append(self, election_id, voter_id, candidate, timestamp=None):
+        with self.lock:
+            chain = self.chains.setdefault(election_id, [])
+            if not chain:
+                chain.append(Block(0, [], time.time(), "0").to_dict())
+            vote = Vote(voter_id, candidate, election_id, timestamp or time.time())
+            block = Block(chain[-1]['index'] + 1, [vote.to_dict()], vote.timestamp, chain[-1]['hash'])
+            seal_block(block)
+            chain.append(block.to_dict())
+
+    def forge(self, election_id, index, candidate):
+        # Change a vote without re-sealing the block
+        with self.lock:
+            self.chains[election_id][index]['transactions'][0]['candidate'] = candidate
+
+    def tally(self, election_id):
+        results = {}
+        for block in self.chains.get(election_id, []):
+            for tx in block['transactions']:
+                results[tx['candidate']] = results.get(tx['candidate'], 0) + 1
+        return results
+
+    def _create_app(self):
+        app = Flask(__name__)
+
+        @app.route('/elections', methods=['GET'])
+        def elections():
+            return jsonify([{"election_id": election_id} for election_id in sorted(self.chains)]), 200
+
+        @app.route('/replication/blocks/<election_id>', methods=['GET'])
+        def replication_blocks(election_id):
+            since = request.args.get('since', default=-1, type=int)
+            limit = request.args.get('limit', default=500, type=int)
+            with self.lock:
+                self.requests.append((election_id, since))
+                chain = list(self.chains.get(election_id, []))
+            blocks = [block for block in chain if block['index'] > since][:limit]
+            return jsonify({
+                "election_id": election_id,
+                "blocks": blocks,
+                "tip_index": chain[-1]['index'] if chain else -1,
+                "tip_hash": chain[-1]['hash'] if chain else None
+            }), 200
+
+        return app
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+def get_json(url, timeout=30):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, json.loads(response.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+class ReplicaProcess:
+    def __init__(self, primary_url, port, data_dir):
+        self.primary_url = primary_url
+        self.port = port
+        self.data_dir = data_dir
+        self.process = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, 'replication.py', '--primary', self.primary_url, '--port', str(self.port), '--data-dir', self.data_dir],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait(10)
+            self.process = None
+
+    def wait_for(self, predicate, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                status, body = get_json(self.url + '/replication/status', timeout=5)
+                if status == 200 and predicate(body):
+                    return True
+            except OSError:
+                pass
+            time.sleep(0.2)
+        return False
+
+def caught_up(primary, election_id):
+    tip = primary.chains[election_id][-1]
+    def check(status):
+        election = status['elections'].get(election_id)
+        return election is not None and election['local_tip'] == tip['index']
+    return check
+
+def run(replica_count, votes, base_port):
+    work_dir = tempfile.mkdtemp(prefix='replication_harness_')
+    primary = StandInPrimary(base_port)
+    primary.start()
+    for i in range(votes):
+        primary.append('A', f'voter-a-{i}', ['Alice', 'Bob', 'Carol'][i % 3])
+    for i in range(votes // 4):
+        primary.append('B', f'voter-b-{i}', ['Dave', 'Erin'][i % 2])
+    replicas = [ReplicaProcess(primary.url, base_port + 1 + i, os.path.join(work_dir, f'replica_{i}'))
+        for i in range(replica_count)]
+    failures = []
+
+    def check(name, ok):
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+        if not ok:
+            failures.append(name)
+
+    try:
+        for replica in replicas:
+            replica.start()
+
+        # catch-up
+        for replica in replicas:
+            ok = all(replica.wait_for(caught_up(primary, election_id)) for election_id in ('A', 'B'))
+            for election_id in ('A', 'B'):
+                _, results = get_json(f'{replica.url}/results/{election_id}')
+                _, verify = get_json(f'{replica.url}/verify/{election_id}')
+                ok = ok and results['results'] == primary.tally(election_id) and verify['valid'] \
+                    and verify['chain_root'] == primary.chains[election_id][-1]['hash']
+            check(f"catch-up on port {replica.port}", ok)
+
+        # long poll
+        tip = primary.chains['A'][-1]['index']
+        appender = threading.Timer(1.0, primary.append, ('A', 'voter-a-late', 'Alice'))
+        appender.start()
+        started = time.monotonic()
+        status, body = get_json(f'{replicas[0].url}/chain/A?since={tip}&wait=10')
+        check("long poll returns the new block",
+            status == 200 and [block['index'] for block in body['chain']] == [tip + 1] and time.monotonic() - started < 9)
+        status, _ = get_json(f'{replicas[0].url}/chain/A?since={tip + 5}&wait=1')
+        check("since ahead of the tip is a 304 after the wait", status == 304)
+
+        # restart
+        restarted = replicas[-1]
+        restarted.stop()
+        for i in range(20):
+            primary.append('A', f'voter-a-extra-{i}', 'Bob')
+        local_tip = tip + 1
+        with primary.lock:
+            primary.requests.clear()
+        restarted.start()
+        ok = restarted.wait_for(caught_up(primary, 'A'))
+        with primary.lock:
+            pulls = [since for election_id, since in primary.requests if election_id == 'A']
+        check("restarted replica only pulls missed blocks", ok and pulls and min(pulls) >= local_tip)
+
+        # rebuild with the same length
+        primary.rebuild('B')
+        new_root = primary.chains['B'][-1]['hash']
+        for replica in replicas:
+            deadline = time.monotonic() + 30
+            verify = None
+            while time.monotonic() < deadline:
+                _, verify = get_json(f'{replica.url}/verify/B')
+                if verify and verify['chain_root'] == new_root:
+                    break
+                time.sleep(0.2)
+            check(f"rebuilt chain replaces the local one on port {replica.port}",
+                verify is not None and verify['chain_root'] == new_root and verify['valid'])
+
+        # tampering
+        primary.append('B', 'voter-b-forged', 'Dave')
+        primary.forge('B', primary.chains['B'][-1]['index'], 'Erin')
+        time.sleep(3)
+        for replica in replicas:
+            _, verify = get_json(f'{replica.url}/verify/B')
+            _, status = get_json(f'{replica.url}/replication/status')
+            check(f"forged block rejected on port {replica.port}",
+                not verify['valid'] and status['elections']['B']['error'] is not None)
+    finally:
+        for replica in replicas:
+            replica.stop()
+        primary.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run read replicas against a stand-in primary on localhost')
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--votes', type=int, default=200)
+    parser.add_argument('--base-port', type=int, default=5600)
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    failures = run(args.replicas, args.votes, args.base_port)
+    print(f"{len(failures)} check(s) failed" if failures else "All checks passed")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from config import Config
+
+# Sealed artifacts of completed elections. Once an election is completed its
+# votes, blocks and results don't change, so the responses are rendered once
+# and kept as ready-to-send JSON bodies.
+# In-memory LRU: {election_id: {'stamp', 'tip_index', 'file', 'results': bytes, 'chain': bytes, 'verification': bytes}}
+# Entries evicted from memory are read back from SEALED_RESULTS_DIR on demand.
+# The file on disk is the source of truth: resuming an election or rebuilding
+# the chain removes it, possibly from another process, so a cached entry is
+# only served while the file it was read from is still in place ('file' is
+# its inode, size and mtime).
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+# An election can be resumed (or its chain rebuilt) after it was sealed, so
+# clients revalidate with the stamp ETag instead of caching for good
+CACHE_CONTROL = 'public, no-cache'
+
+def _artifact_path(election_id):
+    # Election IDs are free text, so name the file after their hash
+    file_name = hashlib.sha256(election_id.encode()).hexdigest() + '.json'
+    return os.path.join(Config.SEALED_RESULTS_DIR, file_name)
+
+def _file_id(stat):
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+def _render(artifact):
+    results = {
+        "results": artifact['results'],
+        "voter_turnout_count": artifact['voter_turnout_count'],
+        "sealed": True,
+        "verification_stamp": artifact['verification_stamp']
+    }
+    chain = {
+        "chain": artifact['chain'],
+        "length": len(artifact['chain']),
+        "election_id": artifact['election_id']
+    }
+    verification = {
+        "election_id": artifact['election_id'],
+        "valid": artifact['chain_valid'],
+        "length": len(artifact['chain']),
+        "chain_root": artifact['chain_root'],
+        "verification_stamp": artifact['verification_stamp'],
+        "sealed_at": artifact['sealed_at']
+    }
+    return {
+        'stamp': artifact['verification_stamp'],
+        'tip_index': artifact['chain'][-1]['index'] if artifact['chain'] else -1,
+        'results': json.dumps(results).encode(),
+        'chain': json.dumps(chain).encode(),
+        'verification': json.dumps(verification).encode()
+    }
+
+def _remember(election_id, entry):
+    with _lock:
+        _cache[election_id] = entry
+        _cache.move_to_end(election_id)
+        while len(_cache) > Config.SEALED_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def store_sealed(election_id, artifact):
+    # Write to a temp file first so readers never see a half-written artifact
+    os.makedirs(Config.SEALED_RESULTS_DIR, exist_ok=True)
+    path = _artifact_path(election_id)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, path)
+    entry = _render(artifact)
+    entry['file'] = _file_id(os.stat(path))
+    _remember(election_id, entry)
+    return entry
+
+def get_sealed(election_id):
+    path = _artifact_path(election_id)
+    try:
+        file_id = _file_id(os.stat(path))
+    except FileNotFoundError:
+        file_id = None
+    with _lock:
+        entry = _cache.get(election_id)
+        if entry is not None and entry['file'] == file_id:
+            _cache.move_to_end(election_id)
+            return entry
+        if file_id is None:
+            _cache.pop(election_id, None)
+            return None
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+            file_id = _file_id(os.fstat(f.fileno()))
+    except FileNotFoundError:
+        return None
+    entry = _render(artifact)
+    entry['file'] = file_id
+    _remember(election_id, entry)
+    return entry
+
+def discard_sealed(election_id):
+    with _lock:
+        _cache.pop(election_id, None)
+    path = _artifact_path(election_id)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,96 @@
+import argparse
+from db import get_db_connection
+
+# Turnout time series. turnout_rollups holds per-minute and per-hour vote
+# counts per election and candidate, keyed by the bucket's start time. Every
+# vote commit bumps its two buckets in the same transaction as the vote, so a
+# turnout chart reads O(buckets) rows instead of scanning votes. `backfill`
+# rebuilds the rollups of an election from votes (e.g. for votes cast before
+# the table existed).
+#
+#   python turnout.py backfill [election_id ...]
+
+GRANULARITIES = {'minute': 60, 'hour': 3600}
+
+UPSERT_ROLLUP_SQL = '''INSERT INTO turnout_rollups (election_id, granularity, bucket_start, candidate, votes)
+    VALUES (%s, 'minute', %s, %s, 1), (%s, 'hour', %s, %s, 1)
+    ON DUPLICATE KEY UPDATE votes = votes + 1'''
+
+def bucket_start(timestamp, granularity):
+    size = GRANULARITIES[granularity]
+    return int(timestamp // size) * size
+
+def rollup_row(election_id, candidate, timestamp):
+    # Parameters of UPSERT_ROLLUP_SQL for one vote
+    return (election_id, bucket_start(timestamp, 'minute'), candidate,
+        election_id, bucket_start(timestamp, 'hour'), candidate)
+
+def backfill(election_id):
+    # Replace the election's rollups with counts recomputed from votes, in one transaction
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM turnout_rollups WHERE election_id=%s', (election_id,))
+        for granularity, size in GRANULARITIES.items():
+            cursor.execute('''INSERT INTO turnout_rollups (election_id, granularity, bucket_start, candidate, votes)
+                SELECT election_id, %s, FLOOR(timestamp / %s) * %s AS bucket, candidate, COUNT(*)
+                FROM votes WHERE election_id=%s
+                GROUP BY election_id, bucket, candidate''', (granularity, size, size, election_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def backfill_all():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT election_id FROM elections')
+    election_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    for election_id in election_ids:
+        backfill(election_id)
+    return election_ids
+
+def get_turnout(election_id, granularity, start=None, end=None, candidate=None):
+    # Buckets with start <= bucket_start < end, oldest first:
+    # [{"start": ts, "votes": n, "candidates": {name: n}}]
+    query = 'SELECT bucket_start, candidate, votes FROM turnout_rollups WHERE election_id=%s AND granularity=%s'
+    params = [election_id, granularity]
+    if start is not None:
+        query += ' AND bucket_start >= %s'
+        params.append(bucket_start(start, granularity))
+    if end is not None:
+        query += ' AND bucket_start < %s'
+        params.append(end)
+    if candidate is not None:
+        query += ' AND candidate=%s'
+        params.append(candidate)
+    query += ' ORDER BY bucket_start'
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    buckets = []
+    for start_time, name, votes in cursor.fetchall():
+        if not buckets or buckets[-1]['start'] != start_time:
+            buckets.append({"start": start_time, "votes": 0, "candidates": {}})
+        buckets[-1]['votes'] += votes
+        buckets[-1]['candidates'][name] = votes
+    cursor.close()
+    conn.close()
+    return buckets
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the turnout rollups')
+    parser.add_argument('command', choices=['backfill'])
+    parser.add_argument('election_ids', nargs='*', help='elections to backfill (default: all)')
+    args = parser.parse_args()
+    if args.election_ids:
+        for election_id in args.election_ids:
+            backfill(election_id)
+        print(f"Backfilled turnout for {len(args.election_ids)} election(s)")
+    else:
+        print(f"Backfilled turnout for {len(backfill_all())} election(s)")
@@ -0,0 +1,266 @@
+import time
+import mysql.connector
+from mysql.connector import errorcode
+from blockchain.block import Block
+from blockchain.consensus import seal_block
+from blockchain.vote import Vote
+from chain_tips import SELECT_TIP_SQL, get_tip, publish_tip
+from db import get_db_connection
+from election_cache import get_voting_status
+from turnout import UPSERT_ROLLUP_SQL, rollup_row
+
+INSERT_VOTE_SQL = 'INSERT INTO votes (voter_id, candidate, election_id, timestamp, hash) VALUES (%s, %s, %s, %s, %s)'
+INSERT_BLOCK_SQL = 'INSERT INTO blocks (election_id, block_index, timestamp, previous_hash, hash, nonce, seal) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+INSERT_BLOCK_TX_SQL = 'INSERT INTO block_transactions (block_id, vote_id) VALUES (%s, %s)'
+# Locks the election's latest block, so writers without a shard take turns appending
+LOCK_TIP_SQL = SELECT_TIP_SQL + ' FOR UPDATE'
+# Share-locks the election row: vote commits don't wait for each other, but a
+# status change (UPDATE elections) waits for the commits in flight, and the
+# commits after it see the new status
+LOCK_ELECTION_SQL = 'SELECT status, start_time, end_time FROM elections WHERE election_id=%s LOCK IN SHARE MODE'
+
+class ElectionClosed(Exception):
+    pass
+
+def check_election_open(cursor, election_id):
+    # Votes are validated before they are queued, so the status is checked
+    # again in the transaction that commits them
+    cursor.execute(LOCK_ELECTION_SQL, (election_id,))
+    row = cursor.fetchone()
+    if not row:
+        raise ElectionClosed("Election not found")
+    status = get_voting_status(dict(zip(('status', 'start_time', 'end_time'), row)))
+    if status != "active":
+        raise ElectionClosed(f"Election is {status}. Cannot vote.")
+
+def build_vote_block(election_id, voter_id, candidate, tip):
+    # tip is (block_index, hash) of the latest stored block, or None for an empty chain.
+    # The vote hash, stored timestamp and block all use the same timestamp.
+    now = time.time()
+    vote = Vote(voter_id, candidate, election_id, now)
+    genesis = None
+    if tip is None:
+        genesis = Block(0, [], now, "0")
+        tip = (genesis.index, genesis.hash)
+    block = Block(tip[0] + 1, [vote], now, tip[1])
+    seal_block(block)
+    return vote, block, genesis
+
+class ElectionState:
+    # Chain tip, voters and tally of one election, owned by the admission shard
+    # that commits its votes. Readers only use `snapshot`, which is replaced
+    # rather than modified.
+    def __init__(self, election_id):
+        self.election_id = election_id
+        self.tip = None
+        self.voted = set()
+        self.snapshot = (-1, {}, 0)  # (tip block_index, results, turnout)
+
+    def load(self, cursor):
+        # Both reads run in the caller's transaction, so they see the same chain
+        cursor.execute(SELECT_TIP_SQL, (self.election_id,))
+        tip = cursor.fetchone()
+        cursor.execute('SELECT voter_id, candidate FROM votes WHERE election_id=%s', (self.election_id,))
+        voted, results = set(), {}
+        for voter_id, candidate in cursor.fetchall():
+            voted.add(voter_id)
+            results[candidate] = results.get(candidate, 0) + 1
+        self.tip = tuple(tip) if tip else None
+        self.voted = voted
+        self.snapshot = (tip[0] if tip else -1, results, len(voted))
+
+    def catch_up(self, cursor):
+        # Apply only the votes in blocks after our tip. If our tip is no longer
+        # on the chain (rebuilt or truncated), load everything again.
+        cursor.execute(SELECT_TIP_SQL, (self.election_id,))
+        tip = cursor.fetchone()
+        tip = tuple(tip) if tip else None
+        if tip == self.tip:
+            return
+        if self.tip is not None:
+            cursor.execute('SELECT hash FROM blocks WHERE election_id=%s AND block_index=%s', (self.election_id, self.tip[0]))
+            row = cursor.fetchone()
+            if tip is None or not row or row[0] != self.tip[1]:
+                self.load(cursor)
+                return
+        cursor.execute('''SELECT v.voter_id, v.candidate FROM blocks b
+            JOIN block_transactions bt ON bt.block_id = b.id
+            JOIN votes v ON v.id = bt.vote_id
+            WHERE b.election_id=%s AND b.block_index > %s''', (self.election_id, self.tip[0] if self.tip else -1))
+        _, results, _ = self.snapshot
+        results = dict(results)
+        for voter_id, candidate in cursor.fetchall():
+            self.voted.add(voter_id)
+            results[candidate] = results.get(candidate, 0) + 1
+        self.tip = tip
+        self.snapshot = (tip[0], results, len(self.voted))
+
+    def is_current(self):
+        # False once another process (or a rebuild) has moved the chain on
+        tip = get_tip(self.election_id)
+        return (tuple(tip) if tip else None) == self.tip
+
+    def record(self, vote, block):
+        _, results, turnout = self.snapshot
+        self.tip = (block.index, block.hash)
+        self.voted.add(vote.voter_id)
+        results = dict(results)
+        results[vote.candidate] = results.get(vote.candidate, 0) + 1
+        self.snapshot = (block.index, results, turnout + 1)
+
+def block_row(election_id, block):
+    return (election_id, block.index, block.timestamp, block.previous_hash, block.hash, block.nonce, block.seal)
+
+def commit_vote(election_id, voter_id, candidate, conn=None, state=None):
+    # Insert the vote, its block, the block_transactions link and the turnout
+    # rollups in one DB transaction. Ids come from lastrowid, so nothing is
+    # looked up by hash. With an ElectionState the block is built on its tip
+    # instead of the one read from the DB; the unique (election_id, block_index)
+    # key rejects the block if someone else appended first. Raises
+    # ElectionClosed if the election is no longer active.
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        check_election_open(cursor, election_id)
+        if state is None:
+            cursor.execute(LOCK_TIP_SQL, (election_id,))
+            tip = cursor.fetchone()
+        else:
+            tip = state.tip
+        vote, block, genesis = build_vote_block(election_id, voter_id, candidate, tip)
+        if genesis:
+            cursor.execute(INSERT_BLOCK_SQL, block_row(election_id, genesis))
+        cursor.execute(INSERT_VOTE_SQL, (vote.voter_id, vote.candidate, vote.election_id, vote.timestamp, vote.hash))
+        vote_id = cursor.lastrowid
+        cursor.execute(INSERT_BLOCK_SQL, block_row(election_id, block))
+        block_id = cursor.lastrowid
+        cursor.execute(INSERT_BLOCK_TX_SQL, (block_id, vote_id))
+        cursor.execute(UPSERT_ROLLUP_SQL, rollup_row(election_id, vote.candidate, vote.timestamp))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+    publish_tip(election_id, block.index, block.hash)
+    if state is not None:
+        state.record(vote, block)
+    return vote, block
+
+def has_voted(cursor, election_id, voter_id):
+    cursor.execute('SELECT id FROM votes WHERE voter_id=%s AND election_id=%s LIMIT 1', (voter_id, election_id))
+    return cursor.fetchone() is not None
+
+def warm_election_state(states, election_id):
+    # Load an election's state ahead of its first vote; a state the shard already has is kept
+    if election_id in states:
+        return
+    state = ElectionState(election_id)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        state.load(cursor)
+    finally:
+        cursor.close()
+        conn.close()
+    states.setdefault(election_id, state)
+
+def _in_read(conn, func):
+    # Run func(cursor) in its own read transaction
+    cursor = conn.cursor()
+    try:
+        func(cursor)
+    finally:
+        cursor.close()
+        conn.rollback()
+
+def _election_state(states, election_id, conn):
+    state = states.get(election_id)
+    if state is None:
+        state = ElectionState(election_id)
+        _in_read(conn, state.load)
+        states[election_id] = state
+    elif not state.is_current():
+        _in_read(conn, state.catch_up)
+    return state
+
+# init_db only adds uniq_election_block once no chain is forked. Until then the
+# shard state can't tell that another process appended first, so votes go
+# through the tip lock like writers without a shard. A missing key is looked up
+# again every UNIQUE_KEY_RECHECK seconds.
+UNIQUE_KEY_RECHECK = 60
+_unique_key = {'present': False, 'checked_at': None}
+
+def has_unique_block_key(conn):
+    checked_at = _unique_key['checked_at']
+    if _unique_key['present'] or (checked_at is not None and time.monotonic() - checked_at < UNIQUE_KEY_RECHECK):
+        return _unique_key['present']
+    cursor = conn.cursor()
+    try:
+        cursor.execute('''SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = 'blocks' AND index_name = 'uniq_election_block' ''')
+        present = cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+        conn.rollback()
+    if not present and checked_at is None:
+        print("blocks has no uniq_election_block key; votes are committed under the tip lock")
+    _unique_key.update(present=present, checked_at=time.monotonic())
+    return present
+
+def commit_vote_batch(votes, states=None):
+    # votes is a list of (election_id, voter_id, candidate). All of them share
+    # one connection, but each vote is its own transaction so one failure
+    # doesn't take the rest of the batch with it. Returns, per vote, True if it
+    # was committed, False if the voter had already voted, or the exception
+    # (ElectionClosed if the election was stopped or suspended meanwhile).
+    # states is the calling shard's {election_id: ElectionState}; without it
+    # (or without the unique block key) every vote locks the tip and checks
+    # for a previous vote in the DB.
+    outcomes = []
+    conn = get_db_connection()
+    try:
+        if states is not None and not has_unique_block_key(conn):
+            states = None
+        for election_id, voter_id, candidate in votes:
+            try:
+                outcomes.append(_commit_one(conn, states, election_id, voter_id, candidate))
+            except Exception as e:
+                outcomes.append(e)
+    finally:
+        conn.close()
+    return outcomes
+
+def _commit_one(conn, states, election_id, voter_id, candidate):
+    if states is None:
+        # The previous-vote check runs after taking the tip lock, in the same
+        # transaction as the insert, so two writers can't both pass it
+        cursor = conn.cursor()
+        cursor.execute(LOCK_TIP_SQL, (election_id,))
+        cursor.fetchone()
+        voted = has_voted(cursor, election_id, voter_id)
+        cursor.close()
+        if voted:
+            # End the read so the next vote doesn't see a stale snapshot
+            conn.rollback()
+            return False
+        commit_vote(election_id, voter_id, candidate, conn)
+        return True
+    # Every vote appends a block, so a vote committed elsewhere since the state
+    # was loaded makes our block collide on its index. The state then catches
+    # up with the blocks it missed, which also brings in that voter.
+    state = _election_state(states, election_id, conn)
+    for attempt in range(2):
+        if voter_id in state.voted:
+            return False
+        try:
+            commit_vote(election_id, voter_id, candidate, conn, state)
+            return True
+        except mysql.connector.IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY or attempt:
+                raise
+            _in_read(conn, state.catch_up)
@@ -0,0 +1,52 @@
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from db import get_db_connection
+
+# LRU of single-voter lookups keyed by hashed ID: {hashed_id: (voter or None, expires_at)}
+# Unknown IDs are cached as None for a shorter time so repeated logins with a
+# mistyped ID don't each cost a query.
+_voters = OrderedDict()
+_lock = threading.Lock()
+
+def _remember(hashed_id, voter, ttl):
+    with _lock:
+        _voters[hashed_id] = (voter, time.time() + ttl)
+        _voters.move_to_end(hashed_id)
+        while len(_voters) > Config.VOTER_CACHE_SIZE:
+            _voters.popitem(last=False)
+
+def get_voter(hashed_id):
+    with _lock:
+        cached = _voters.get(hashed_id)
+        if cached and cached[1] > time.time():
+            _voters.move_to_end(hashed_id)
+            return cached[0]
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('SELECT hashed_id, name, email, place, age, status FROM voters WHERE hashed_id=%s', (hashed_id,))
+    voter = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    _remember(hashed_id, voter, Config.VOTER_CACHE_TTL if voter else Config.VOTER_NEGATIVE_TTL)
+    return voter
+
+def invalidate_voter(hashed_id):
+    with _lock:
+        _voters.pop(hashed_id, None)
+
+def mask_email(email):
+    name, _, domain = email.partition('@')
+    return f"{name[:1]}***@{domain}" if domain else "***"
+
+def public_voter(voter):
+    # Fields the voter UI needs; the full email never leaves the server
+    return {
+        'hashed_id': voter['hashed_id'],
+        'name': voter['name'],
+        'email': mask_email(voter['email']),
+        'place': voter['place'],
+        'age': voter['age'],
+        'status': voter['status']
+    }
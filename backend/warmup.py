@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from chain_tips import get_tip
+from config import Config
+from db import get_db_connection
+from election_cache import get_election_meta
+from vote_ledger import warm_election_state
+
+# Startup warm-up. For every election that is running or yet to run, loads
+# what the vote path would otherwise load on its first requests: the election
+# metadata and approved voters, the chain tip, and the admission shard's tally
+# and voted set. Elections are warmed in parallel, and /health only reports
+# ready once all of them are done, so a restarted server gets traffic warm.
+
+class Warmup:
+    def __init__(self, admission):
+        self.admission = admission
+        self.ready = threading.Event()
+        self.elections = 0
+        self.warmed = 0
+        self.failed = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def _open_elections(self):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT election_id FROM elections WHERE status <> 'completed' AND end_time > %s", (time.time(),))
+        election_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return election_ids
+
+    def _warm(self, election_id):
+        get_election_meta(election_id)
+        get_tip(election_id)
+        warm_election_state(self.admission.shard(election_id).state, election_id)
+
+    def run(self):
+        self.started_at = time.time()
+        try:
+            election_ids = self._open_elections()
+            self.elections = len(election_ids)
+            with ThreadPoolExecutor(max_workers=Config.WARMUP_WORKERS) as pool:
+                futures = {pool.submit(self._warm, election_id): election_id for election_id in election_ids}
+                for future, election_id in futures.items():
+                    try:
+                        future.result()
+                        self.warmed += 1
+                    except Exception as e:
+                        # Not fatal: that election is loaded lazily as before
+                        self.failed[election_id] = str(e)
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+            self.failed['*'] = str(e)
+        self.finished_at = time.time()
+        self.ready.set()
+
+    def start(self):
+        threading.Thread(target=self.run, name='warmup', daemon=True).start()
+
+    def skip(self):
+        self.ready.set()
+
+    def status(self):
+        return {
+            "elections": self.elections,
+            "warmed": self.warmed,
+            "failed": self.failed,
+            "duration_seconds": (self.finished_at - self.started_at) if self.finished_at and self.started_at else None
+        }
@@ -1,24 +1,18 @@
 from flask import Flask
 from flask_socketio import SocketIO, emit
-from blockchain.blockchain import Blockchain
-import threading
-import time
+from config import Config
+from replication import Replica
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-blockchain = Blockchain()
-
-def mine_blocks_periodically():
-    while True:
-        time.sleep(10)  # Mine every 10 seconds if there are pending transactions
-        if len(blockchain.pending_transactions) > 0:
-            blockchain.mine_pending_transactions()
-            socketio.emit('block_mined', {
-                'message': 'New block mined',
-                'block_count': len(blockchain.chain)
-            })
+def announce_blocks(replica, election_id, blocks):
+    socketio.emit('block_mined', {
+        'message': 'New block mined',
+        'election_id': election_id,
+        'block_count': len(replica.get_chain(election_id).blocks)
+    })
 
 @socketio.on('connect')
 def handle_connect():
@@ -26,9 +20,10 @@ def handle_connect():
     emit('connection_response', {'data': 'Connected to voting system'})
 
 if __name__ == '__main__':
-    # Start the mining thread
-    mining_thread = threading.Thread(target=mine_blocks_periodically)
-    mining_thread.daemon = True
-    mining_thread.start()
+    # Follow the API server's chains instead of keeping a separate blockchain
+    replica = Replica(Config.REPLICATION_PRIMARY_URL, 'replica_ws')
+    replica.on_new_blocks(lambda election_id, blocks: announce_blocks(replica, election_id, blocks))
+    replica.start()
     
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # No reloader: its second process would start another replica on the same files
+    socketio.run(app, host='0.0.0.0', port=5001, debug=True, use_reloader=False)
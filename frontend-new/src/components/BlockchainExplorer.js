@@ -14,9 +14,7 @@ const BlockchainExplorer = () => {
 
   useEffect(() => {
     if (selectedElection) {
-      fetchChain(selectedElection);
-      const interval = setInterval(() => fetchChain(selectedElection), 3000);
-      return () => clearInterval(interval);
+      return followChain(selectedElection);
     }
   }, [selectedElection]);
 
@@ -38,23 +36,56 @@ const BlockchainExplorer = () => {
     }
   };
 
-  const fetchChain = async (electionId) => {
-    try {
-      const response = await fetch(`http://localhost:5000/chain/${electionId}`);
-      if (response.ok) {
-        const data = await response.json();
-        setChain(data.chain || []);
-        setError('');
-      } else {
-        const errorData = await response.json();
-        setError(errorData.message || 'Failed to fetch blockchain data');
+  // Fetch the chain once, then long-poll for blocks after the last one we have.
+  // Asking by hash lets the server send the whole chain again (reset) if it was rebuilt.
+  const followChain = (electionId) => {
+    const controller = new AbortController();
+    let cancelled = false;
+    let blocks = [];
+
+    const poll = async () => {
+      let first = true;
+      while (!cancelled) {
+        const after = blocks.length > 0 ? `since_hash=${blocks[blocks.length - 1].hash}` : 'since=-1';
+        const url = first
+          ? `http://localhost:5000/chain/${electionId}`
+          : `http://localhost:5000/chain/${electionId}?${after}&wait=25`;
+        try {
+          const response = await fetch(url, { signal: controller.signal });
+          if (response.status === 304) {
+            // No new blocks (completed elections answer immediately)
+            await new Promise(resolve => setTimeout(resolve, 3000));
+            continue;
+          }
+          if (response.ok) {
+            const data = await response.json();
+            blocks = first || data.reset ? (data.chain || []) : blocks.concat(data.chain || []);
+            first = false;
+            setChain(blocks);
+            setError('');
+          } else {
+            const errorData = await response.json();
+            setError(errorData.message || 'Failed to fetch blockchain data');
+            await new Promise(resolve => setTimeout(resolve, 3000));
+          }
+          setLoading(false);
+        } catch (error) {
+          if (cancelled) {
+            return;
+          }
+          setError('Error connecting to server. Please make sure the backend is running on port 5000.');
+          setLoading(false);
+          console.error('Error fetching chain:', error);
+          await new Promise(resolve => setTimeout(resolve, 3000));
+        }
       }
-      setLoading(false);
-    } catch (error) {
-      setError('Error connecting to server. Please make sure the backend is running on port 5000.');
-      setLoading(false);
-      console.error('Error fetching chain:', error);
-    }
+    };
+
+    poll();
+    return () => {
+      cancelled = true;
+      controller.abort();
+    };
   };
 
   const formatHash = (hash) => {
@@ -103,32 +103,19 @@ const Login = ({ onLogin }) => {
     setLoginOtpLoading(true);
     setMessage('');
     try {
-      // Fetch email for voterId
-      const response = await fetch('http://localhost:5000/voters');
+      // The backend looks up the voter's email and sends the OTP
+      const response = await fetch('http://localhost:5000/send_login_otp', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ id: voterId.trim() })
+      });
+      const data = await response.json();
       if (response.ok) {
-        const voters = await response.json();
-        const registeredVoter = voters.find(v => v.original_id === voterId.trim());
-        if (registeredVoter) {
-          const otpRes = await fetch('http://localhost:5000/send_otp', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ email: registeredVoter.email })
-          });
-          const otpData = await otpRes.json();
-          if (otpRes.ok) {
-            setLoginOtpSent(true);
-            setMessage('OTP sent to your email. Please check your inbox.');
-            setVariant('success');
-          } else {
-            setMessage(otpData.message);
-            setVariant('danger');
-          }
-        } else {
-          setMessage('Voter ID not found. Please register first.');
-          setVariant('danger');
-        }
+        setLoginOtpSent(true);
+        setMessage('OTP sent to your email. Please check your inbox.');
+        setVariant('success');
       } else {
-        setMessage('Error connecting to server. Please try again.');
+        setMessage(data.message);
         setVariant('danger');
       }
     } catch (error) {
@@ -148,46 +135,34 @@ const Login = ({ onLogin }) => {
       return;
     }
     try {
-      // Fetch email for voterId
-      const response = await fetch('http://localhost:5000/voters');
-      if (response.ok) {
-        const voters = await response.json();
-        const registeredVoter = voters.find(v => v.original_id === voterId.trim());
-        if (registeredVoter) {
-          // Verify OTP
-          const verifyRes = await fetch('http://localhost:5000/verify_otp', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ email: registeredVoter.email, otp: loginOtp })
-          });
-          const verifyData = await verifyRes.json();
-          if (!verifyRes.ok) {
-            setMessage(verifyData.message);
-            setVariant('danger');
-            setLoading(false);
-            return;
-          }
-          if (registeredVoter.status === 'Active') {
-            const voter = {
-              id: registeredVoter.original_id,
-              name: registeredVoter.name,
-              place: registeredVoter.place,
-              email: registeredVoter.email,
-              age: registeredVoter.age
-            };
-            onLogin(voter, 'voter');
-            setMessage('');
-          } else {
-            setMessage(`Your account status is: ${registeredVoter.status}. Please contact administrator.`);
-            setVariant('warning');
-          }
-        } else {
-          setMessage('Voter ID not found. Please register first.');
-          setVariant('danger');
-        }
-      } else {
-        setMessage('Error connecting to server. Please try again.');
+      // Verify OTP and fetch the voter's details in one request
+      const response = await fetch('http://localhost:5000/login_voter', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ id: voterId.trim(), otp: loginOtp })
+      });
+      const data = await response.json();
+      if (!response.ok) {
+        setMessage(data.message);
         setVariant('danger');
+        setLoading(false);
+        return;
+      }
+      const registeredVoter = data.voter;
+      if (registeredVoter.status === 'Active') {
+        const voter = {
+          id: voterId.trim(),
+          hashed_id: registeredVoter.hashed_id,
+          name: registeredVoter.name,
+          place: registeredVoter.place,
+          email: registeredVoter.email,
+          age: registeredVoter.age
+        };
+        onLogin(voter, 'voter');
+        setMessage('');
+      } else {
+        setMessage(`Your account status is: ${registeredVoter.status}. Please contact administrator.`);
+        setVariant('warning');
       }
     } catch (error) {
       setMessage('Error connecting to server. Please check if backend is running.');
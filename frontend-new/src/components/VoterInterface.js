@@ -32,11 +32,9 @@ const VoterInterface = ({ user, onLogout }) => {
 
   const fetchVoterInfo = async () => {
     try {
-      const response = await fetch('http://localhost:5000/voters');
+      const response = await fetch(`http://localhost:5000/voter/${user.hashed_id}`);
       if (response.ok) {
-        const voters = await response.json();
-        const currentVoter = voters.find(v => v.original_id === user.id);
-        setVoterInfo(currentVoter);
+        setVoterInfo(await response.json());
       }
     } catch (error) {
       console.error('Error fetching voter information:', error);